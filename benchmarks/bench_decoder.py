@@ -0,0 +1,225 @@
+"""Compares the generated PGN decoders (pgns.py) with the table driven decoder.
+
+The generated module is taken from the last revision that still had it (or ``--baseline``),
+the table driven decoder from the working tree. Both sides load every decoder here, see
+bench_startup.py for the decoders loaded on demand. Each side is loaded into a package of
+its own next to a ``publish_field`` that does nothing, and measured in a fresh interpreter:
+
+* import time: importing pgns.py, or importing decoder.py and building all decoders from
+  pgn_fields/, once without bytecode cache and best of ``--repeat`` runs with it
+* memory: the memory allocated by that import (tracemalloc) and the growth of the resident
+  set size
+* decode time per frame of every Single frame PGN definition on random 8 byte payloads
+
+Run with ``python benchmarks/bench_decoder.py``.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from common import measure
+
+GENERATED = "generated"
+TABLE = "table"
+PACKAGE = "decoders"
+REPOSITORY_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COMPONENT_PATH = "custom_components/smart2000usb-naviop"
+
+# PGNs reported on their own besides the average over all definitions
+HIGHLIGHTED_PGNS = (127250, 127488, 128267, 130306)
+
+SENSOR_STUB = "def publish_field(*args):\n    pass\n"
+
+
+def git(*args):
+    return subprocess.run(["git", *args], cwd=REPOSITORY_DIR, capture_output=True, text=True, check=True).stdout
+
+
+def baseline_revision():
+    """Returns the last revision that had pgns.py."""
+    path = f"{COMPONENT_PATH}/pgns.py"
+    if subprocess.run(["git", "cat-file", "-e", f"HEAD:{path}"], cwd=REPOSITORY_DIR, capture_output=True).returncode == 0:
+        return "HEAD"
+    removal = git("rev-list", "-n", "1", "HEAD", "--", path).strip()
+    return f"{removal}^"
+
+
+def write_package(directory, files):
+    """Writes a package holding ``files`` (name -> text) and the publish_field stub."""
+    package = os.path.join(directory, PACKAGE)
+    os.makedirs(package)
+    files = dict(files, **{"__init__.py": "", "sensor.py": SENSOR_STUB})
+    for name, text in files.items():
+        os.makedirs(os.path.dirname(os.path.join(package, name)), exist_ok=True)
+        with open(os.path.join(package, name), "w") as file:
+            file.write(text)
+
+
+def component_file(name):
+    with open(os.path.join(REPOSITORY_DIR, COMPONENT_PATH, name)) as file:
+        return file.read()
+
+
+def resident_kib():
+    """Returns the resident set size of this process in KiB, None where unknown."""
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except OSError:
+        return None
+
+
+def load(kind):
+    """Imports one side and returns its decoders as [(pgn, callable)] in definition order."""
+    if kind == GENERATED:
+        from decoders import pgns
+
+        names = re.findall(r"(?m)^def (process_pgn_(\d+)\w*)\(", open(pgns.__file__).read())
+        return [(int(pgn), getattr(pgns, name)) for name, pgn in names]
+
+    from decoders.decoder import PGN_FIELDS_DIR, load_decoders
+
+    return [
+        (decoder.pgn, decoder)
+        for name in sorted(os.listdir(PGN_FIELDS_DIR))
+        for decoder in load_decoders(os.path.join(PGN_FIELDS_DIR, name))
+    ]
+
+
+def worker(kind, mode, messages, repeat):
+    """Measures one side in this interpreter and prints the results as JSON."""
+    if mode == "import":
+        rss_before = resident_kib()
+        start = time.perf_counter()
+        load(kind)
+        elapsed = time.perf_counter() - start
+        rss_after = resident_kib()
+        print(json.dumps({
+            "import_ms": elapsed * 1000,
+            "rss_kib": rss_after - rss_before if rss_before is not None else None,
+        }))
+        return
+
+    tracemalloc.start()
+    functions = load(kind)
+    allocated = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    with open(os.path.join(PACKAGE, "pgn_type.json")) as file:
+        frame_types = dict(map(tuple, json.load(file)["PGNs"]))
+
+    # The generated functions take the payload as little endian integer, the table driven
+    # decoders the bytes
+    rng = random.Random(1)
+    inputs = [rng.randbytes(8) for _ in range(messages)]
+    if kind == GENERATED:
+        inputs = [int.from_bytes(data, "little") for data in inputs]
+
+    def decode(function):
+        for data in inputs:
+            function(None, "bench", data)
+
+    per_pgn = {}
+    for pgn, function in functions:
+        if frame_types.get(pgn) == "Single":
+            per_pgn.setdefault(pgn, []).append(measure(decode, function, repeat=repeat) / messages * 1e6)
+
+    print(json.dumps({
+        "allocated_kib": allocated / 1024,
+        "definitions": len(functions),
+        "single_definitions": sum(len(times) for times in per_pgn.values()),
+        "us_per_frame": sum(sum(times) for times in per_pgn.values()) / sum(len(times) for times in per_pgn.values()),
+        "pgns": {str(pgn): round(min(per_pgn[pgn]), 3) for pgn in HIGHLIGHTED_PGNS if pgn in per_pgn},
+    }))
+
+
+def run_worker(directory, kind, mode, args):
+    # Bytecode is cached like in a Home Assistant installation
+    environment = {name: value for name, value in os.environ.items() if name != "PYTHONDONTWRITEBYTECODE"}
+    environment["PYTHONPATH"] = directory
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--worker", kind, mode, "--messages", str(args.messages), "--repeat", str(args.repeat)],
+        cwd=directory,
+        env=environment,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(output)
+
+
+def measure_side(directory, kind, args):
+    """Returns the import, memory and decode results of one side."""
+    # The first import compiles the module, like the first start after an update, later
+    # ones load it from the bytecode cache
+    imports = [run_worker(directory, kind, "import", args) for _ in range(args.repeat + 1)]
+    results = run_worker(directory, kind, "decode", args)
+    results["import_cold_ms"] = imports[0]["import_ms"]
+    results["import_ms"] = min(run["import_ms"] for run in imports[1:])
+    results["rss_kib"] = imports[-1]["rss_kib"]
+    return results
+
+
+def format_value(value):
+    return "-" if value is None else f"{value:.3f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--baseline", help="git revision of the generated pgns.py (default: the last one that had it)")
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--worker", nargs=2, metavar=("KIND", "MODE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(*args.worker, args.messages, args.repeat)
+        return
+
+    baseline = args.baseline or baseline_revision()
+    pgn_type = component_file("pgn_type.json")
+    results = {}
+    with tempfile.TemporaryDirectory() as root:
+        sides = {
+            GENERATED: {
+                "pgns.py": git("show", f"{baseline}:{COMPONENT_PATH}/pgns.py"),
+                "utils.py": git("show", f"{baseline}:{COMPONENT_PATH}/utils.py"),
+            },
+            TABLE: {
+                **{
+                    f"pgn_fields/{name}": component_file(f"pgn_fields/{name}")
+                    for name in os.listdir(os.path.join(REPOSITORY_DIR, COMPONENT_PATH, "pgn_fields"))
+                },
+                "pgn_lookups.json": component_file("pgn_lookups.json"),
+                "decoder.py": component_file("decoder.py"),
+                "utils.py": component_file("utils.py"),
+            },
+        }
+        for kind, files in sides.items():
+            directory = os.path.join(root, kind)
+            write_package(directory, dict(files, **{"pgn_type.json": pgn_type}))
+            results[kind] = measure_side(directory, kind, args)
+
+    print(f"baseline: {baseline}")
+    print(f"{'':<24} {'generated':>12} {'table':>12}")
+    for key, label in (
+        ("import_cold_ms", "import ms (no .pyc)"),
+        ("import_ms", "import ms"),
+        ("allocated_kib", "allocated KiB"),
+        ("rss_kib", "resident KiB"),
+        ("us_per_frame", "us/frame (all Single)"),
+    ):
+        print(f"{label:<24} {format_value(results[GENERATED][key]):>12} {format_value(results[TABLE][key]):>12}")
+    for pgn in results[GENERATED]["pgns"]:
+        print(f"{'us/frame ' + pgn:<24} {results[GENERATED]['pgns'][pgn]:>12} {results[TABLE]['pgns'].get(pgn, '-'):>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Micro-benchmark of the serial stream framer.
+
+Compares the original ``read_loop`` framing (two ``find`` calls and a buffer rebuild per
+packet) with ``Smart2000Framer``. Run with ``python benchmarks/bench_framer.py``.
+"""
+import argparse
+import random
+
+from common import build_frame, can_id_for, load_component_module, measure
+
+# 100 bytes is what the stream reader asks for, the larger sizes match the bursts an
+# asyncio protocol receives when the event loop has been busy for a while
+CHUNK_SIZES = (100, 1024, 16384, 65536)
+
+
+def build_stream(frame_count, seed=1):
+    """Builds a byte stream of single frame PGNs with payloads free of 0x55 bytes."""
+    rng = random.Random(seed)
+    pgns = (127250, 127251, 128259, 128267, 129025, 129026, 130306, 130312)
+    frames = []
+    for _ in range(frame_count):
+        payload = bytes(rng.choice([b for b in range(256) if b not in (0x55, 0xAA)]) for _ in range(8))
+        frames.append(build_frame(can_id_for(rng.choice(pgns), rng.randrange(1, 64)), payload))
+    return b"".join(frames)
+
+
+def legacy_framing(stream, chunk_size):
+    """The framing loop ``SerialSensor.read_loop`` used before the framer was introduced."""
+    frames = 0
+    buffer = bytearray()
+    for offset in range(0, len(stream), chunk_size):
+        buffer.extend(stream[offset:offset + chunk_size])
+        while True:
+            start = buffer.find(b'\xaa')
+            end = buffer.find(b'\x55', start)
+            if start == -1 or end == -1:
+                break
+            packet = buffer[start:end + 1]
+            if len(packet) > 2:
+                frames += 1
+            buffer = buffer[end + 1:]
+    return frames
+
+
+def framer_framing(stream, chunk_size, framer_class):
+    """Feeds the stream through ``Smart2000Framer`` in serial sized chunks."""
+    frames = 0
+    framer = framer_class()
+    for offset in range(0, len(stream), chunk_size):
+        for _packet in framer.feed(stream[offset:offset + chunk_size]):
+            frames += 1
+    return frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, default=100000)
+    args = parser.parse_args()
+
+    framer_class = load_component_module("framer").Smart2000Framer
+    stream = build_stream(args.frames)
+
+    print(f"{'chunk':>6} {'framing':<8} {'frames/s':>12} {'us/frame':>10}")
+    for chunk_size in CHUNK_SIZES:
+        assert legacy_framing(stream, chunk_size) == args.frames
+        assert framer_framing(stream, chunk_size, framer_class) == args.frames
+
+        legacy = measure(legacy_framing, stream, chunk_size)
+        framer = measure(framer_framing, stream, chunk_size, framer_class)
+
+        for label, elapsed in (("legacy", legacy), ("framer", framer)):
+            print(f"{chunk_size:>6} {label:<8} {args.frames / elapsed:>12,.0f} {elapsed / args.frames * 1e6:>10.2f}")
+
+if __name__ == "__main__":
+    main()
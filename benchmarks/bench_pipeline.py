@@ -0,0 +1,270 @@
+"""End-to-end benchmark of the decode pipeline against a stub Home Assistant.
+
+Each hot path is driven on its own: framing as read_loop does it, process_packet,
+process_frame, fast packet reassembly, representative PGN decoders and publishing to
+existing sensors. For every case the throughput, the time per frame and the memory
+allocated per frame are reported, and the results are written to a JSON file that a
+later run can be compared against with ``--compare``. Run with
+``python benchmarks/bench_pipeline.py``.
+
+CPython has no counter of total allocations, so allocations are reported as the peak
+traced memory while one frame is processed (``alloc_bytes``) and the memory blocks still
+allocated afterwards (``retained_blocks``), both averaged over a sample of frames.
+"""
+import argparse
+import asyncio
+from datetime import datetime, timedelta
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tracemalloc
+
+from common import COMPONENT_DIR, load_component_module, measure
+from simulator import encode_frame, fast_packet_frames
+from stub_hass import setup_instance
+
+INSTANCE = "bench"
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+ALLOCATION_SAMPLE = 2000
+
+SINGLE_PGNS = (127250, 127251, 127257, 127488, 128259, 128267, 129025, 129026, 130306, 130312)
+FAST_PGNS = {129029: 43, 129038: 28, 129794: 75}
+
+# Decoders and the size of the payload they are handed, in bytes
+DECODERS = {127488: 8, 129029: 43, 129038: 28, 129794: 75, 126996: 134, 130306: 8}
+
+
+def build_traffic(message_count, seed=1):
+    """Builds the encoded frames of a mix of single frame and fast packet messages."""
+    rng = random.Random(seed)
+    frames = []
+    sequences = {}
+    for _ in range(message_count):
+        source = rng.randrange(1, 21)
+        if rng.random() < 0.8:
+            frames.append(encode_frame(rng.choice(SINGLE_PGNS), source, rng.randbytes(8)))
+            continue
+
+        pgn = rng.choice(list(FAST_PGNS))
+        sequence = sequences.get((pgn, source), -1) + 1
+        sequences[(pgn, source)] = sequence
+        frames.extend(fast_packet_frames(pgn, source, rng.randbytes(FAST_PGNS[pgn]), sequence))
+    return frames
+
+
+class FakeReader:
+    """Stands in for the asyncio StreamReader of the serial port."""
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._offset = 0
+
+    async def read(self, size):
+        data = self._stream[self._offset:self._offset + size]
+        self._offset += size
+        return data
+
+
+class Benchmarks:
+    """Builds the inputs once and exposes one callable per case."""
+
+    def __init__(self, message_count):
+        self.sensor, self.hass = setup_instance(INSTANCE)
+        self.timestamps = self.hass.data[f"{INSTANCE}_smart2000timestamp_key"]
+
+        self.frames = build_traffic(message_count)
+        self.stream = b"".join(self.frames)
+        self.single_frames = [frame for frame in self.frames if (int.from_bytes(frame[2:6], "little") >> 8) & 0x3FFFF in SINGLE_PGNS]
+        can_frame = load_component_module("can_frame").CanFrame
+        self.can_frames = [can_frame.from_packet(frame) for frame in self.single_frames]
+
+        rng = random.Random(2)
+        self.fast_frames = []
+        for sequence in range(message_count // 8):
+            self.fast_frames.extend(fast_packet_frames(129029, 1, rng.randbytes(43), sequence))
+        self.fast_can_frames = [can_frame.from_packet(frame) for frame in self.fast_frames]
+
+        self.decoder_inputs = {
+            pgn: [rng.randbytes(length) for _ in range(message_count // 4)]
+            for pgn, length in DECODERS.items()
+        }
+
+        # Create every sensor once, the cases measure the steady state of updates
+        self.throttle(False)
+        for frame in self.frames:
+            self.sensor.process_packet(self.hass, INSTANCE, frame)
+        self.pgn_index = load_component_module("dispatch").PGN_INDEX
+        for pgn, inputs in self.decoder_inputs.items():
+            self.pgn_index[pgn].decoder(self.hass, INSTANCE, inputs[0])
+
+        self.created_sensors = list(self.hass.data[f"{INSTANCE}_created_sensors"].values())
+        self.publish_args = [
+            (self.hass, INSTANCE, "heading", "Heading", value * 0.0001, "Vessel Heading", "rad", "127250")
+            for value in range(message_count)
+        ]
+
+    def throttle(self, enabled):
+        """Turns the per PGN rate limit on (the production default) or off."""
+        self.timestamps["min_interval"] = timedelta(seconds=5) if enabled else timedelta(0)
+        self.timestamps["last_processed"].clear()
+
+    def cases(self):
+        """Returns (name, frame count, function, per frame function, per frame inputs)."""
+        sensor = self.sensor
+        hass = self.hass
+        transport = load_component_module("transport")
+        framer_class = load_component_module("framer").Smart2000Framer
+        fast_packet = load_component_module("fast_packet")
+
+        def read_loop_framing():
+            packets = []
+            asyncio.run(transport.read_stream(FakeReader(self.stream), framer_class(), packets.append))
+
+        def process_packet(frames):
+            for frame in frames:
+                sensor.process_packet(hass, INSTANCE, frame)
+
+        def process_frame(frames):
+            for frame in frames:
+                sensor.process_frame(hass, INSTANCE, frame)
+
+        def process_fast_packet(frames):
+            for frame in frames:
+                sensor.process_fast_packet(hass, INSTANCE, frame)
+
+        def fast_packet_assembly(frames):
+            assembler = fast_packet.FastPacketAssembler()
+            for frame in frames:
+                assembler.add_frame(frame.pgn, frame.source, frame.data)
+
+        def decode(function, inputs):
+            for data_raw in inputs:
+                function(hass, INSTANCE, data_raw)
+
+        def publish_field(args):
+            for arguments in args:
+                sensor.publish_field(*arguments)
+
+        def set_state(count):
+            entity = self.created_sensors[0]
+            for value in range(count):
+                entity.set_state(value)
+
+        count = len(self.frames)
+        cases = [
+            ("read_loop_framing", count, read_loop_framing, None, None),
+            ("process_packet", count, lambda: process_packet(self.frames), process_packet, self.frames),
+            ("process_packet_throttled", count, lambda: process_packet(self.frames), process_packet, self.frames),
+            ("process_frame", len(self.can_frames), lambda: process_frame(self.can_frames), process_frame, self.can_frames),
+            ("process_fast_packet", len(self.fast_can_frames), lambda: process_fast_packet(self.fast_can_frames), None, None),
+            ("fast_packet_assembly", len(self.fast_can_frames), lambda: fast_packet_assembly(self.fast_can_frames), None, None),
+        ]
+        for pgn, inputs in self.decoder_inputs.items():
+            function = self.pgn_index[pgn].decoder
+            cases.append((
+                f"process_pgn_{pgn}",
+                len(inputs),
+                lambda function=function, inputs=inputs: decode(function, inputs),
+                lambda inputs, function=function: decode(function, inputs),
+                inputs,
+            ))
+        cases.append(("publish_field", len(self.publish_args), lambda: publish_field(self.publish_args), publish_field, self.publish_args))
+        cases.append(("set_state", count, lambda: set_state(count), None, None))
+        return cases
+
+
+def allocations(per_frame, inputs):
+    """Returns (peak bytes, retained blocks) per frame over a sample of inputs."""
+    sample = inputs[:ALLOCATION_SAMPLE]
+    peak_total = 0
+    blocks = sys.getallocatedblocks()
+
+    tracemalloc.start()
+    for item in sample:
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        per_frame([item])
+        peak_total += tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+
+    retained = sys.getallocatedblocks() - blocks
+    return round(peak_total / len(sample), 1), round(max(retained, 0) / len(sample), 3)
+
+
+def git_revision():
+    """Returns the current commit of the repository, if known."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=COMPONENT_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="JSON file for the results (default: benchmarks/results/pipeline_<time>.json)")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare against")
+    args = parser.parse_args()
+
+    benchmarks = Benchmarks(args.messages)
+    previous = None
+    if args.compare:
+        with open(args.compare) as file:
+            previous = json.load(file)["cases"]
+
+    results = {}
+    print(f"{'case':<26} {'frames/s':>12} {'us/frame':>10} {'alloc B':>9} {'retained':>9}" + ("   change" if previous else ""))
+    for name, count, function, per_frame, inputs in benchmarks.cases():
+        benchmarks.throttle(name == "process_packet_throttled")
+        elapsed = measure(function, repeat=args.repeat)
+        alloc_bytes, retained = allocations(per_frame, inputs) if per_frame else (None, None)
+
+        results[name] = {
+            "frames": count,
+            "frames_per_s": round(count / elapsed),
+            "us_per_frame": round(elapsed / count * 1e6, 3),
+            "alloc_bytes_per_frame": alloc_bytes,
+            "retained_blocks_per_frame": retained,
+        }
+
+        line = (
+            f"{name:<26} {count / elapsed:>12,.0f} {elapsed / count * 1e6:>10.3f}"
+            f" {alloc_bytes if alloc_bytes is not None else '-':>9} {retained if retained is not None else '-':>9}"
+        )
+        if previous and name in previous:
+            change = previous[name]["us_per_frame"] / results[name]["us_per_frame"] - 1
+            line += f" {change:>+8.1%}"
+        print(line)
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"pipeline_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(output, "w") as file:
+        json.dump(
+            {
+                "timestamp": datetime.now().isoformat(timespec="seconds"),
+                "revision": git_revision(),
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "messages": args.messages,
+                "cases": results,
+            },
+            file,
+            indent=2,
+        )
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""Measures the setup time and memory of the integration against a stub Home Assistant.
+
+The working tree is compared with a git revision (``--baseline``), which should be the
+revision before the changes being measured rather than just the previous commit. Each is
+measured in a fresh interpreter, with its bytecode cached as after the first start:
+
+* setup: importing sensor.py and running async_setup_entry, as Home Assistant does when
+  the integration is loaded or reloaded
+* first frames: one message each of the PGNs a typical boat sends, which is when decoders
+  loaded on demand are loaded
+* memory: the memory allocated by both steps (tracemalloc) and the growth of the resident
+  set size
+
+Run with ``python benchmarks/bench_startup.py --baseline <revision>``.
+"""
+import argparse
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+import tracemalloc
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPOSITORY_DIR = os.path.dirname(BENCHMARK_DIR)
+COMPONENT_PATH = "custom_components/smart2000usb-naviop"
+
+# Seen on a boat with a chart plotter, autopilot, engine gateway and AIS
+TYPICAL_PGNS = (
+    59392, 59904, 60928, 126992, 126993, 126996, 127245, 127250, 127251, 127257,
+    127258, 127488, 127489, 127505, 127508, 128259, 128267, 128275, 129025, 129026,
+    129029, 129033, 129038, 129039, 129283, 129284, 129539, 129540, 129794, 129809,
+    129810, 130306, 130310, 130311, 130312, 130313, 130314, 130316, 130577, 130578,
+)
+FAST_PACKET_LENGTH = 32
+
+
+def resident_kib():
+    """Returns the resident set size of this process in KiB, None where unknown."""
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except OSError:
+        return None
+
+
+def first_frames(component_dir):
+    """Returns the encoded frames of one message of each typical PGN."""
+    from simulator import encode_frame, fast_packet_frames
+
+    with open(os.path.join(component_dir, "pgn_type.json")) as file:
+        frame_types = dict(map(tuple, json.load(file)["PGNs"]))
+
+    rng = random.Random(1)
+    frames = []
+    for source, pgn in enumerate(TYPICAL_PGNS, start=1):
+        if frame_types.get(pgn) == "Fast":
+            frames.extend(fast_packet_frames(pgn, source, rng.randbytes(FAST_PACKET_LENGTH), 0))
+        else:
+            frames.append(encode_frame(pgn, source, rng.randbytes(8)))
+    return frames
+
+
+def worker(component_dir, traced):
+    """Sets up one tree in this interpreter and prints the results as JSON."""
+    import common
+
+    common.COMPONENT_DIR = component_dir
+    from stub_hass import install
+
+    install()
+    frames = first_frames(component_dir)
+
+    if traced:
+        tracemalloc.start()
+    rss_start = resident_kib()
+    start = time.perf_counter()
+
+    from stub_hass import setup_instance
+
+    sensor, hass = setup_instance("bench")
+    setup = time.perf_counter()
+    setup_memory = tracemalloc.get_traced_memory()[0] if traced else None
+    rss_setup = resident_kib()
+
+    for frame in frames:
+        sensor.process_packet(hass, "bench", frame)
+    end = time.perf_counter()
+    end_memory = tracemalloc.get_traced_memory()[0] if traced else None
+    rss_end = resident_kib()
+
+    if traced:
+        print(json.dumps({"setup_kib": setup_memory / 1024, "total_kib": end_memory / 1024}))
+        return
+    print(json.dumps({
+        "setup_ms": (setup - start) * 1000,
+        "first_frames_ms": (end - setup) * 1000,
+        "setup_rss_kib": rss_setup - rss_start if rss_start is not None else None,
+        "total_rss_kib": rss_end - rss_start if rss_start is not None else None,
+    }))
+
+
+def run_worker(component_dir, traced=False):
+    # Bytecode is cached like in a Home Assistant installation
+    environment = {name: value for name, value in os.environ.items() if name != "PYTHONDONTWRITEBYTECODE"}
+    command = [sys.executable, os.path.abspath(__file__), "--worker", component_dir]
+    if traced:
+        command.append("--traced")
+    output = subprocess.run(command, cwd=BENCHMARK_DIR, env=environment, capture_output=True, text=True, check=True).stdout
+    return json.loads(output)
+
+
+def measure_tree(component_dir, repeat):
+    """Returns the best times of ``repeat`` runs and the memory of one traced run."""
+    run_worker(component_dir)  # Compiles the bytecode
+    runs = [run_worker(component_dir) for _ in range(repeat)]
+    results = {key: min(run[key] for run in runs) for key in ("setup_ms", "first_frames_ms")}
+    results.update({key: runs[-1][key] for key in ("setup_rss_kib", "total_rss_kib")})
+    results.update(run_worker(component_dir, traced=True))
+    return results
+
+
+def export_revision(revision, directory):
+    """Writes the integration as of a git revision to ``directory``, returns its path."""
+    archive = subprocess.run(
+        ["git", "archive", "--format=tar", revision, COMPONENT_PATH],
+        cwd=REPOSITORY_DIR,
+        capture_output=True,
+        check=True,
+    ).stdout
+    with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+        tar.extractall(directory)
+    return os.path.join(directory, COMPONENT_PATH)
+
+
+def format_value(value):
+    return "-" if value is None else f"{value:.1f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--baseline", help="git revision to compare with (required)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--traced", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.worker, args.traced)
+        return
+    if not args.baseline:
+        parser.error("--baseline is required, e.g. the revision before the changes being measured")
+
+    with tempfile.TemporaryDirectory() as root:
+        results = {
+            args.baseline: measure_tree(export_revision(args.baseline, root), args.repeat),
+            "working tree": measure_tree(os.path.join(REPOSITORY_DIR, COMPONENT_PATH), args.repeat),
+        }
+
+    print(f"{len(TYPICAL_PGNS)} PGNs in the first frames")
+    print(f"{'':<24}" + "".join(f"{name:>14}" for name in results))
+    for key, label in (
+        ("setup_ms", "setup ms"),
+        ("first_frames_ms", "first frames ms"),
+        ("setup_kib", "setup allocated KiB"),
+        ("total_kib", "total allocated KiB"),
+        ("setup_rss_kib", "setup resident KiB"),
+        ("total_rss_kib", "total resident KiB"),
+    ):
+        print(f"{label:<24}" + "".join(f"{format_value(result[key]):>14}" for result in results.values()))
+
+
+if __name__ == "__main__":
+    main()
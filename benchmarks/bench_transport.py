@@ -0,0 +1,122 @@
+"""Benchmark of the stream reader and protocol serial transports on a pty-backed fake device.
+
+A writer thread pushes framed packets into the master side of a pseudo-terminal as fast as
+it can while the transport under test reads the slave side through pyserial-asyncio. The
+writer only starts once the port is open, as opening it flushes the input buffer. Needs
+``pyserial-asyncio`` and a POSIX system. Run with ``python benchmarks/bench_transport.py``.
+"""
+import argparse
+import asyncio
+import os
+import random
+import threading
+import time
+import tty
+
+from common import build_frame, can_id_for, load_component_module
+
+import serial_asyncio
+
+WRITE_SIZE = 4096
+
+
+def build_stream(frame_count, seed=1):
+    """Builds a byte stream of single frame PGNs from a handful of sources."""
+    rng = random.Random(seed)
+    pgns = (127250, 127251, 128259, 128267, 129025, 129026, 130306, 130312)
+    return b"".join(
+        build_frame(can_id_for(rng.choice(pgns), rng.randrange(1, 32)), rng.randbytes(8))
+        for _ in range(frame_count)
+    )
+
+
+def write_stream(master_fd, stream):
+    """Writes the stream to the pty master, blocking whenever the reader falls behind."""
+    view = memoryview(stream)
+    offset = 0
+    while offset < len(view):
+        offset += os.write(master_fd, view[offset:offset + WRITE_SIZE])
+
+
+class Counter:
+    """Packet callback that resolves a future once the expected number of packets arrived."""
+
+    def __init__(self, expected, done):
+        self.expected = expected
+        self.done = done
+        self.packets = 0
+
+    def __call__(self, packet):
+        self.packets += 1
+        if self.packets == self.expected and not self.done.done():
+            self.done.set_result(None)
+
+
+async def run_stream(port, framer, counter, on_open):
+    """Reads the fake device with the stream reader transport."""
+    transport_module = load_component_module("transport")
+    reader, writer = await serial_asyncio.open_serial_connection(url=port, baudrate=2000000)
+    on_open()
+    task = asyncio.ensure_future(transport_module.read_stream(reader, framer, counter))
+    await counter.done
+    task.cancel()
+    writer.close()
+
+
+async def run_protocol(port, framer, counter, on_open):
+    """Reads the fake device with the protocol transport."""
+    transport_module = load_component_module("transport")
+    transport, _protocol = await serial_asyncio.create_serial_connection(
+        asyncio.get_running_loop(),
+        lambda: transport_module.Smart2000Protocol(framer, counter),
+        url=port,
+        baudrate=2000000,
+    )
+    on_open()
+    await counter.done
+    transport.close()
+
+
+async def run_once(mode, stream, frame_count):
+    """Runs one transport against a fresh pty and returns wall and CPU seconds."""
+    framer_class = load_component_module("framer").Smart2000Framer
+    master_fd, slave_fd = os.openpty()
+    tty.setraw(master_fd)
+    port = os.ttyname(slave_fd)
+
+    counter = Counter(frame_count, asyncio.get_running_loop().create_future())
+    writer = threading.Thread(target=write_stream, args=(master_fd, stream), daemon=True)
+    started = {}
+
+    def start_writer():
+        # Opening the port resets its input buffer, anything written before is lost
+        started["wall"] = time.perf_counter()
+        started["cpu"] = time.process_time()
+        writer.start()
+
+    runner = run_stream if mode == "stream" else run_protocol
+    await asyncio.wait_for(runner(port, framer_class(), counter, start_writer), timeout=120)
+    wall = time.perf_counter() - started["wall"]
+    cpu = time.process_time() - started["cpu"]
+
+    writer.join()
+    os.close(master_fd)
+    os.close(slave_fd)
+    return wall, cpu
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, default=200000)
+    args = parser.parse_args()
+
+    stream = build_stream(args.frames)
+
+    print(f"{'transport':<10} {'frames/s':>12} {'cpu us/frame':>13}")
+    for mode in ("stream", "protocol"):
+        wall, cpu = asyncio.run(run_once(mode, stream, args.frames))
+        print(f"{mode:<10} {args.frames / wall:>12,.0f} {cpu / args.frames * 1e6:>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Shared helpers for the Smart2000 USB benchmarks.
+
+The integration lives in a directory whose name is not a valid Python identifier and its
+``__init__.py`` needs Home Assistant, so the benchmarks register the component directory as
+a bare package and import the individual modules from it.
+"""
+import importlib
+import os
+import sys
+import time
+import types
+
+COMPONENT_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "custom_components",
+    "smart2000usb-naviop",
+)
+PACKAGE_NAME = "smart2000usb_naviop"
+
+
+def load_component_module(name):
+    """Import ``name`` from the integration without running its ``__init__.py``."""
+    if PACKAGE_NAME not in sys.modules:
+        package = types.ModuleType(PACKAGE_NAME)
+        package.__path__ = [COMPONENT_DIR]
+        sys.modules[PACKAGE_NAME] = package
+    return importlib.import_module(f"{PACKAGE_NAME}.{name}")
+
+
+def build_frame(can_id, payload):
+    """Encode one extended CAN frame the way the Smart2000 USB device sends it."""
+    payload = bytes(payload)
+    return (
+        b"\xaa"
+        + bytes([0xE0 | len(payload)])
+        + can_id.to_bytes(4, "little")
+        + payload
+        + b"\x55"
+    )
+
+
+def can_id_for(pgn, source, priority=3):
+    """Builds the 29 bit CAN identifier for a PGN sent by ``source``."""
+    return (priority << 26) | (pgn << 8) | source
+
+
+def measure(func, *args, repeat=5):
+    """Runs ``func`` ``repeat`` times and returns the best wall clock time in seconds."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
@@ -0,0 +1,297 @@
+"""Pseudo-terminal Smart2000 USB device simulator for load and soak testing.
+
+Opens a pty and writes framed ``0xAA ... 0x55`` packets to it the way the Smart2000 USB
+device does, so the integration can be pointed at the printed port (or at ``--link``)
+instead of a real device. The traffic mix, frame rate, fast packet PGNs, number of
+interleaved sources and injected corruption are configurable. Needs a POSIX system and
+nothing beyond the standard library, run with ``python benchmarks/simulator.py --help``.
+
+Examples::
+
+    # Normal traffic at 50% of a 250 kbit/s NMEA 2000 bus
+    python benchmarks/simulator.py --load 50 --link /tmp/ttySMART2000
+
+    # 150% bus load, AIS heavy, 8 interleaved fast packet sources and 0.1% corruption
+    python benchmarks/simulator.py --load 150 --mix 129038:5,129794:2,127250:1 --sources 8 --corrupt 0.001
+"""
+import argparse
+import errno
+import os
+import random
+import sys
+import time
+import tty
+
+BUS_BITRATE = 250000
+# An extended CAN frame with 8 data bytes is 131 bits before bit stuffing, ~20% stuffing
+# on average gives the usual planning figure of about 1600 frames/s at 100% bus load
+BITS_PER_FRAME = 157
+
+TICK = 0.01  # Seconds between writes
+MAX_BACKLOG = 64 * 1024  # Bytes held back while the reader is not draining the pty
+
+# PGN and weight, loosely modelled on a leisure boat with a plotter, AIS and engine data
+DEFAULT_MIX = {
+    127250: 10,  # Vessel Heading
+    127251: 10,  # Rate of Turn
+    127257: 10,  # Attitude
+    127488: 10,  # Engine Parameters, Rapid Update
+    128259: 2,  # Speed
+    128267: 2,  # Water Depth
+    129025: 10,  # Position, Rapid Update
+    129026: 4,  # COG & SOG, Rapid Update
+    130306: 10,  # Wind Data
+    130312: 1,  # Temperature
+    127489: 1,  # Engine Parameters, Dynamic (fast packet)
+    129029: 1,  # GNSS Position Data (fast packet)
+    129038: 4,  # AIS Class A Position Report (fast packet)
+    129039: 2,  # AIS Class B Position Report (fast packet)
+    129794: 1,  # AIS Class A Static and Voyage Related Data (fast packet)
+}
+
+# Fast packet PGNs and the length of their payload in bytes
+DEFAULT_FAST_PGNS = {
+    126996: 134,
+    127489: 26,
+    129029: 43,
+    129038: 28,
+    129039: 26,
+    129540: 153,
+    129794: 75,
+    129809: 27,
+    129810: 34,
+}
+
+CORRUPTIONS = ("flip", "drop", "truncate", "noise", "terminator")
+
+
+def parse_mix(text):
+    """Parses ``pgn:weight,pgn:weight`` into a dict."""
+    mix = {}
+    for item in text.split(","):
+        pgn, _, weight = item.partition(":")
+        mix[int(pgn)] = float(weight or 1)
+    return mix
+
+
+def parse_fast_pgns(text):
+    """Parses ``pgn:length,pgn:length`` into a dict, the length defaults to 32 bytes."""
+    fast_pgns = {}
+    for item in text.split(","):
+        pgn, _, length = item.partition(":")
+        fast_pgns[int(pgn)] = int(length or 32)
+    return fast_pgns
+
+
+def encode_frame(pgn, source, data, priority=3):
+    """Encodes one extended CAN frame the way the Smart2000 USB device sends it."""
+    can_id = (priority << 26) | (pgn << 8) | source
+    return b"".join((
+        bytes((0xAA, 0xE0 | len(data))),
+        can_id.to_bytes(4, "little"),
+        data,
+        b"\x55",
+    ))
+
+
+def fast_packet_frames(pgn, source, payload, sequence):
+    """Splits a payload into the frames of one fast packet message."""
+    frames = []
+    header = (sequence & 0x7) << 5
+    first = payload[:6]
+    frames.append(encode_frame(pgn, source, bytes((header, len(payload))) + first + b"\xff" * (6 - len(first))))
+
+    frame_number = 1
+    for offset in range(6, len(payload), 7):
+        chunk = payload[offset:offset + 7]
+        frames.append(encode_frame(pgn, source, bytes((header | frame_number,)) + chunk + b"\xff" * (7 - len(chunk))))
+        frame_number += 1
+    return frames
+
+
+class TrafficGenerator:
+    """
+    Produces the frame stream of a bus with several devices talking at once.
+
+    Every message is assigned a random source. Up to ``interleave`` fast packet messages are
+    in flight at a time and their frames are sent mixed with each other and with single
+    frame traffic, the way a busy bus delivers them.
+    """
+
+    def __init__(self, mix, fast_pgns, sources, interleave, corrupt, seed=None):
+        self.rng = random.Random(seed)
+        self.pgns = list(mix)
+        self.weights = [mix[pgn] for pgn in self.pgns]
+        self.fast_pgns = fast_pgns
+        self.sources = list(range(1, sources + 1))
+        self.interleave = interleave
+        self.corrupt = corrupt
+
+        self.sequences = {}
+        self.in_flight = []
+
+        self.frames = 0
+        self.messages = 0
+        self.corrupted = 0
+
+    def _start_message(self):
+        """Picks the next message and returns its frames."""
+        rng = self.rng
+        pgn = rng.choices(self.pgns, self.weights)[0]
+        source = rng.choice(self.sources)
+        self.messages += 1
+
+        length = self.fast_pgns.get(pgn)
+        if length is None:
+            return [encode_frame(pgn, source, rng.randbytes(8))]
+
+        key = (pgn, source)
+        sequence = self.sequences.get(key, -1) + 1
+        self.sequences[key] = sequence
+        return fast_packet_frames(pgn, source, rng.randbytes(length), sequence)
+
+    def next_frame(self):
+        """Returns the encoded bytes of the next frame on the bus."""
+        rng = self.rng
+        if len(self.in_flight) < self.interleave and (not self.in_flight or rng.random() < 0.5):
+            self.in_flight.append(self._start_message())
+
+        frames = rng.choice(self.in_flight)
+        frame = frames.pop(0)
+        if not frames:
+            self.in_flight.remove(frames)
+
+        self.frames += 1
+        if self.corrupt and rng.random() < self.corrupt:
+            frame = self._corrupt(frame)
+        return frame
+
+    def _corrupt(self, frame):
+        """Damages a frame the way a noisy USB serial link does."""
+        rng = self.rng
+        self.corrupted += 1
+        kind = rng.choice(CORRUPTIONS)
+        frame = bytearray(frame)
+
+        if kind == "flip":
+            frame[rng.randrange(len(frame))] ^= 1 << rng.randrange(8)
+        elif kind == "drop":
+            del frame[rng.randrange(len(frame))]
+        elif kind == "truncate":
+            del frame[rng.randrange(1, len(frame)):]
+        elif kind == "noise":
+            frame[0:0] = rng.randbytes(rng.randrange(1, 8))
+        else:
+            frame[-1] = rng.choice((0x00, 0xAA, 0xFF))
+        return bytes(frame)
+
+
+def open_pty(link=None):
+    """Opens a raw pty and returns (master fd, slave fd, port name)."""
+    master_fd, slave_fd = os.openpty()
+    tty.setraw(master_fd)
+    tty.setraw(slave_fd)
+    os.set_blocking(master_fd, False)
+    port = os.ttyname(slave_fd)
+
+    if link:
+        if os.path.islink(link):
+            os.unlink(link)
+        os.symlink(port, link)
+        port = link
+    return master_fd, slave_fd, port
+
+
+def run(args):
+    """Writes traffic to the pty until the duration is over or the user interrupts."""
+    mix = parse_mix(args.mix) if args.mix else dict(DEFAULT_MIX)
+    fast_pgns = dict(DEFAULT_FAST_PGNS)
+    if args.fast_pgns:
+        fast_pgns.update(parse_fast_pgns(args.fast_pgns))
+
+    rate = args.rate or BUS_BITRATE / BITS_PER_FRAME * args.load / 100
+    generator = TrafficGenerator(mix, fast_pgns, args.sources, args.interleave, args.corrupt, args.seed)
+
+    master_fd, slave_fd, port = open_pty(args.link)
+    print(f"Simulating a Smart2000 USB device on {port} at {rate:,.0f} frames/s", flush=True)
+
+    backlog = bytearray()
+    written = 0
+    dropped = 0
+    start = time.monotonic()
+    last_report = start
+    try:
+        while True:
+            now = time.monotonic()
+            if args.duration and now - start >= args.duration:
+                break
+
+            # Generate what is due since the start, a slow tick does not lower the rate
+            due = int((now - start) * rate) - generator.frames
+            chunk = b"".join(generator.next_frame() for _ in range(due))
+
+            if len(backlog) + len(chunk) > MAX_BACKLOG:
+                # Nobody is reading: the device buffer overflows and whole frames get lost
+                dropped += due
+            else:
+                backlog += chunk
+
+            if backlog:
+                try:
+                    count = os.write(master_fd, backlog)
+                    del backlog[:count]
+                    written += count
+                except OSError as exc:
+                    if exc.errno not in (errno.EAGAIN, errno.EIO):
+                        raise
+
+            if now - last_report >= args.report:
+                elapsed = now - start
+                print(
+                    f"{elapsed:7.1f}s  frames {generator.frames:>10,}  messages {generator.messages:>9,}"
+                    f"  corrupted {generator.corrupted:>7,}  dropped {dropped:>9,}"
+                    f"  {written / elapsed / 1024:8.1f} KiB/s",
+                    flush=True,
+                )
+                last_report = now
+
+            time.sleep(TICK)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        os.close(master_fd)
+        os.close(slave_fd)
+        if args.link and os.path.islink(args.link):
+            os.unlink(args.link)
+
+    return generator, dropped
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.splitlines()[0],
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--load", type=float, default=100, help="bus load in percent of 250 kbit/s (default 100)")
+    parser.add_argument("--rate", type=float, default=0, help="frames per second, overrides --load")
+    parser.add_argument("--mix", help="traffic mix as pgn:weight,... (default: a typical leisure boat)")
+    parser.add_argument("--fast-pgns", help="additional fast packet PGNs as pgn:length,...")
+    parser.add_argument("--sources", type=int, default=4, help="number of source addresses (default 4)")
+    parser.add_argument("--interleave", type=int, default=4, help="fast packet messages in flight at once (default 4)")
+    parser.add_argument("--corrupt", type=float, default=0, help="probability a frame is corrupted (default 0)")
+    parser.add_argument("--duration", type=float, default=0, help="seconds to run, 0 runs until interrupted")
+    parser.add_argument("--report", type=float, default=5, help="seconds between progress lines (default 5)")
+    parser.add_argument("--link", help="also make the pty available under this path")
+    parser.add_argument("--seed", type=int, help="seed for a reproducible stream")
+    args = parser.parse_args()
+
+    if args.sources < 1 or args.sources > 252:
+        parser.error("--sources must be between 1 and 252")
+
+    generator, dropped = run(args)
+    print(f"Sent {generator.frames - dropped:,} frames, {generator.corrupted:,} corrupted, {dropped:,} dropped")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""Minimal stand-ins for the parts of Home Assistant the integration touches.
+
+``install()`` registers just enough of the ``homeassistant`` package in ``sys.modules`` for
+``sensor.py`` to import, and ``setup_instance()`` runs the real ``async_setup_entry``
+against a ``StubHass``, so ``hass.data`` is laid out exactly as in production. Entities
+are accepted and their state writes counted, nothing else happens, so benchmarks measure
+the integration and not Home Assistant.
+"""
+import asyncio
+import enum
+import os
+import sys
+import types
+
+from common import load_component_module
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class Entity:
+    """Entity base class that only counts state writes."""
+
+    hass = None
+    state_writes = 0
+
+    def async_schedule_update_ha_state(self, force_refresh=False):
+        Entity.state_writes += 1
+
+    def async_write_ha_state(self):
+        Entity.state_writes += 1
+
+
+class SensorEntity(Entity):
+    pass
+
+
+class SensorStateClass(str, enum.Enum):
+    MEASUREMENT = "measurement"
+
+
+def _module(name, **attributes):
+    module = types.ModuleType(name)
+    module.__dict__.update(attributes)
+    sys.modules[name] = module
+    return module
+
+
+def install():
+    """Registers the stub ``homeassistant`` modules, unless Home Assistant is installed."""
+    if "homeassistant" in sys.modules:
+        return
+
+    _module("homeassistant", __path__=[])
+    _module("homeassistant.core", callback=lambda func: func, HomeAssistant=object)
+    _module("homeassistant.components", __path__=[])
+    _module("homeassistant.components.sensor", SensorEntity=SensorEntity, SensorStateClass=SensorStateClass)
+    _module("homeassistant.helpers", __path__=[])
+    _module("homeassistant.helpers.entity", Entity=Entity)
+    _module("homeassistant.helpers.event", async_track_state_change=lambda *args, **kwargs: None)
+    _module("homeassistant.helpers.entity_platform", AddEntitiesCallback=object)
+    _module("homeassistant.config_entries", ConfigEntry=object)
+    _module("homeassistant.const", CONF_NAME="name", EVENT_HOMEASSISTANT_STOP="homeassistant_stop")
+
+
+class StubConfig:
+    """hass.config, rooted at the repository so pgn_type.json is found."""
+
+    config_dir = REPO_DIR
+
+    def path(self, *parts):
+        return os.path.join(self.config_dir, *parts)
+
+
+class StubBus:
+    def async_listen_once(self, event_type, listener):
+        pass
+
+
+class StubHass:
+    """The attributes of a HomeAssistant instance the integration uses."""
+
+    def __init__(self, loop):
+        self.data = {}
+        self.config = StubConfig()
+        self.bus = StubBus()
+        self.loop = loop
+
+    def async_add_executor_job(self, target, *args):
+        return self.loop.run_in_executor(None, target, *args)
+
+
+class StubEntry:
+    def __init__(self, data):
+        self.data = data
+        self.options = {}
+
+
+def setup_instance(name="bench", **options):
+    """
+    Runs async_setup_entry for a stub config entry and returns (sensor module, hass).
+
+    Entities added by the integration get hass set, as Home Assistant would do. The
+    serial sensor itself is never started.
+    """
+    install()
+    sensor_module = load_component_module("sensor")
+
+    loop = asyncio.new_event_loop()
+    hass = StubHass(loop)
+
+    def add_entities(entities, update_before_add=False):
+        for entity in entities:
+            entity.hass = hass
+
+    data = {"name": name, "serial_port": "/dev/null", "baudrate": 2000000}
+    data.update(options)
+    loop.run_until_complete(sensor_module.async_setup_entry(hass, StubEntry(data), add_entities))
+
+    # Stop the availability task async_setup_entry started
+    tasks = asyncio.all_tasks(loop)
+    for task in tasks:
+        task.cancel()
+    loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+    return sensor_module, hass
@@ -0,0 +1,303 @@
+"""
+Copyright (c) 2024 Smart Boat Innovations
+
+Version 1.0, 01 June 2024
+
+This file is part of the Smart Boat Innovations software.
+
+Smart Boat Innovations ("Licensor") grants you a limited, non-exclusive, non-transferable, revocable license to load and use this software through Home Assistant Community Store (HACS) for personal, non-commercial use only.
+
+You may not copy, distribute, or modify this file or the accompanying software. The software is provided "as is", without warranty of any kind, express or implied, including but not limited to the warranties of merchantability, fitness for a particular purpose and noninfringement. In no event shall the authors or copyright holders be liable for any claim, damages or other liability, whether in an action of contract, tort or otherwise, arising from, out of or in connection with the software or the use or other dealings in the software.
+
+See the full license text in the accompanying LICENSE file.
+"""
+
+# Standard Library Imports
+from collections import deque
+import logging
+import threading
+import time
+
+from .can_frame import decode_can_id
+from .framer import TYPE_EXTENDED_FLAG
+
+OVERLOAD_DROP_OLDEST = "drop_oldest"
+OVERLOAD_DROP_PRIORITY = "drop_priority"
+OVERLOAD_COALESCE = "coalesce"
+OVERLOAD_POLICIES = [OVERLOAD_DROP_OLDEST, OVERLOAD_DROP_PRIORITY, OVERLOAD_COALESCE]
+
+DEFAULT_QUEUE_SIZE = 2048
+
+# Priority lanes, decoded strictly in this order
+LANE_HIGH = 0
+LANE_NORMAL = 1
+LANE_LOW = 2
+LANE_NAMES = ("high", "normal", "low")
+
+# Time critical navigation data, never starved by bulk traffic
+HIGH_PRIORITY_PGNS = frozenset([
+    127245,  # Rudder
+    127250,  # Vessel Heading
+    127251,  # Rate of Turn
+    127257,  # Attitude
+    127258,  # Magnetic Variation
+    128259,  # Speed
+    128267,  # Water Depth
+    129025,  # Position, Rapid Update
+    129026,  # COG & SOG, Rapid Update
+    129029,  # GNSS Position Data
+    130306,  # Wind Data
+])
+
+# AIS and other bulk traffic
+LOW_PRIORITY_PGNS = frozenset([
+    129038,  # AIS Class A Position Report
+    129039,  # AIS Class B Position Report
+    129040,  # AIS Class B Extended Position Report
+    129041,  # AIS Aids to Navigation (AtoN) Report
+    129793,  # AIS UTC and Date Report
+    129794,  # AIS Class A Static and Voyage Related Data
+    129798,  # AIS SAR Aircraft Position Report
+    129801,  # AIS Addressed Safety Related Message
+    129802,  # AIS Safety Related Broadcast Message
+    129809,  # AIS Class B static data (msg 24 Part A)
+    129810,  # AIS Class B static data (msg 24 Part B)
+])
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def frame_header(packet):
+    """
+    Returns (can_id, priority, pgn) for a framed packet.
+
+    The PGN is extracted the same way process_packet does it, so lanes line up with what
+    the decoder sees.
+    """
+    can_id = int.from_bytes(packet[2:6], byteorder='little')
+    pgn, priority, _source, _destination = decode_can_id(can_id)
+    return can_id, priority, pgn
+
+
+def is_proprietary_pgn(pgn):
+    """Returns True for the PGN ranges reserved for manufacturer proprietary messages."""
+    return pgn == 61184 or pgn == 126720 or 65280 <= pgn <= 65535 or 130816 <= pgn <= 131071
+
+
+def lane_for_can_priority(priority):
+    """Maps a CAN priority (0 highest, 7 lowest) to a lane."""
+    if priority <= 2:
+        return LANE_HIGH
+    if priority <= 5:
+        return LANE_NORMAL
+    return LANE_LOW
+
+
+class FrameQueue:
+    """
+    Bounded queue of raw frames between the framer and the PGN decoder.
+
+    Frames are sorted into priority lanes and the decoder always drains the high lane before
+    the normal lane and the normal lane before the low one, in arrival order within a lane.
+    A PGN is assigned to a lane the first time it is seen: from the high or low priority PGN
+    sets when listed there, AIS and proprietary PGNs go to the low lane, and all others
+    are seeded from the CAN priority bits of the frame. Standard (11 bit) frames carry no
+    PGN and go to the low lane.
+
+    When the queue is full the overload policy decides which frame is shed:
+
+    - drop_oldest: the oldest queued frame is dropped.
+    - drop_priority: the oldest frame of the lowest lane below the new frame is dropped, or
+      the new frame itself when nothing queued is in a lower lane.
+    - coalesce: the new frame replaces the queued frame with the same PGN and source. Fast
+      packet frames also keep their frame counter in the key, so only the same part of a
+      newer message replaces an older one. Without a match the oldest frame is dropped.
+
+    Every shed frame is counted, and the time frames wait in each lane is measured. The
+    queue is safe to use from a reader and a decoder running on different threads.
+    """
+
+    def __init__(
+        self,
+        maxsize=DEFAULT_QUEUE_SIZE,
+        policy=OVERLOAD_DROP_OLDEST,
+        fast_pgns=(),
+        high_priority_pgns=(),
+        low_priority_pgns=(),
+    ):
+        if policy not in OVERLOAD_POLICIES:
+            _LOGGER.error("Unknown overload policy '%s', using '%s'", policy, OVERLOAD_DROP_OLDEST)
+            policy = OVERLOAD_DROP_OLDEST
+
+        self.maxsize = maxsize
+        self.policy = policy
+        self._fast_pgns = frozenset(fast_pgns)
+        self._lock = threading.Lock()
+
+        # PGN to lane, filled in as PGNs are seen
+        self._pgn_lanes = {}
+        for pgn in LOW_PRIORITY_PGNS.union(low_priority_pgns):
+            self._pgn_lanes[pgn] = LANE_LOW
+        for pgn in HIGH_PRIORITY_PGNS.union(high_priority_pgns):
+            self._pgn_lanes[pgn] = LANE_HIGH
+
+        # Entries are [packet, key, lane, enqueue time] lists
+        self._lanes = tuple(deque() for _ in LANE_NAMES)
+        self._latest = {}
+        self._size = 0
+
+        self.enqueued = 0
+        self.shed = 0
+        self.coalesced = 0
+        self.max_depth = 0
+
+        # Per lane: frames dequeued, total and maximum wait since the last stats() call
+        self._lane_frames = [0] * len(LANE_NAMES)
+        self._lane_wait = [0.0] * len(LANE_NAMES)
+        self._lane_max_wait = [0.0] * len(LANE_NAMES)
+
+    def __len__(self):
+        return self._size
+
+    def _lane(self, pgn, priority):
+        """Returns the lane of a PGN, assigning one the first time the PGN is seen."""
+        if is_proprietary_pgn(pgn):
+            lane = LANE_LOW
+        else:
+            lane = lane_for_can_priority(priority)
+        self._pgn_lanes[pgn] = lane
+        return lane
+
+    def put(self, packet):
+        """Queue a copy of packet, shedding a frame according to the policy when full."""
+        packet = bytes(packet)
+        if packet[1] & TYPE_EXTENDED_FLAG:
+            can_id, priority, pgn = frame_header(packet)
+
+            key = can_id & 0x3FFFFFF  # PGN and source, without the priority bits
+            if pgn in self._fast_pgns and len(packet) > 6:
+                key = (key, packet[6] & 0x1F)  # Frame counter, without the sequence counter
+        else:
+            # The decoder ignores standard frames, their 2 ID bytes keep them apart from PGNs
+            pgn = None
+            key = packet[2:4]
+
+        with self._lock:
+            self.enqueued += 1
+
+            if pgn is None:
+                lane = LANE_LOW
+            else:
+                lane = self._pgn_lanes.get(pgn)
+                if lane is None:
+                    lane = self._lane(pgn, priority)
+
+            if self._size >= self.maxsize and not self._make_room(packet, key, lane):
+                return
+
+            entry = [packet, key, lane, time.monotonic()]
+            self._lanes[lane].append(entry)
+            self._size += 1
+            if self.policy == OVERLOAD_COALESCE:
+                self._latest[key] = entry
+
+            if self._size > self.max_depth:
+                self.max_depth = self._size
+
+    def _make_room(self, packet, key, lane):
+        """Shed a frame for an incoming one, returns False if the incoming frame was absorbed."""
+        self.shed += 1
+
+        if self.policy == OVERLOAD_COALESCE:
+            entry = self._latest.get(key)
+            if entry is not None:
+                entry[0] = packet
+                self.coalesced += 1
+                return False
+
+        elif self.policy == OVERLOAD_DROP_PRIORITY:
+            for lower in range(len(self._lanes) - 1, lane, -1):
+                if self._lanes[lower]:
+                    self._discard(self._lanes[lower].popleft())
+                    return True
+            # Nothing queued is less important than the new frame
+            return False
+
+        # Drop the oldest queued frame, which is at the head of one of the lanes
+        oldest = None
+        for queued in self._lanes:
+            if queued and (oldest is None or queued[0][3] < oldest[0][3]):
+                oldest = queued
+        self._discard(oldest.popleft())
+        return True
+
+    def _discard(self, entry):
+        """Forget a shed entry."""
+        self._size -= 1
+        if self._latest.get(entry[1]) is entry:
+            del self._latest[entry[1]]
+
+    def get_batch(self, max_frames):
+        """Remove and return up to max_frames packets, highest lane first."""
+        batch = []
+        with self._lock:
+            if not self._size:
+                return batch
+
+            now = time.monotonic()
+            latest = self._latest
+            for lane, queued in enumerate(self._lanes):
+                count = 0
+                wait = 0.0
+                max_wait = self._lane_max_wait[lane]
+                while queued and len(batch) < max_frames:
+                    entry = queued.popleft()
+                    if latest and latest.get(entry[1]) is entry:
+                        del latest[entry[1]]
+                    batch.append(entry[0])
+
+                    waited = now - entry[3]
+                    wait += waited
+                    if waited > max_wait:
+                        max_wait = waited
+                    count += 1
+
+                if count:
+                    self._size -= count
+                    self._lane_frames[lane] += count
+                    self._lane_wait[lane] += wait
+                    self._lane_max_wait[lane] = max_wait
+
+                if len(batch) >= max_frames:
+                    break
+
+        return batch
+
+    def stats(self):
+        """
+        Returns the queue counters.
+
+        Lane latencies cover the frames dequeued since the previous call, which starts a
+        new measurement period.
+        """
+        with self._lock:
+            stats = {
+                "queue_size": self._size,
+                "queue_max_depth": self.max_depth,
+                "queue_enqueued": self.enqueued,
+                "queue_shed": self.shed,
+                "queue_coalesced": self.coalesced,
+            }
+
+            for lane, name in enumerate(LANE_NAMES):
+                frames = self._lane_frames[lane]
+                stats[f"lane_{name}_depth"] = len(self._lanes[lane])
+                stats[f"lane_{name}_frames"] = frames
+                stats[f"lane_{name}_latency_avg_ms"] = round(self._lane_wait[lane] / frames * 1000, 3) if frames else None
+                stats[f"lane_{name}_latency_max_ms"] = round(self._lane_max_wait[lane] * 1000, 3)
+
+                self._lane_frames[lane] = 0
+                self._lane_wait[lane] = 0.0
+                self._lane_max_wait[lane] = 0.0
+
+        return stats
@@ -0,0 +1,76 @@
+"""
+Copyright (c) 2024 Smart Boat Innovations
+
+Version 1.0, 01 June 2024
+
+This file is part of the Smart Boat Innovations software.
+
+Smart Boat Innovations ("Licensor") grants you a limited, non-exclusive, non-transferable, revocable license to load and use this software through Home Assistant Community Store (HACS) for personal, non-commercial use only.
+
+You may not copy, distribute, or modify this file or the accompanying software. The software is provided "as is", without warranty of any kind, express or implied, including but not limited to the warranties of merchantability, fitness for a particular purpose and noninfringement. In no event shall the authors or copyright holders be liable for any claim, damages or other liability, whether in an action of contract, tort or otherwise, arising from, out of or in connection with the software or the use or other dealings in the software.
+
+See the full license text in the accompanying LICENSE file.
+"""
+
+# Standard Library Imports
+from functools import lru_cache
+import logging
+
+from .framer import TYPE_LENGTH_MASK
+
+BROADCAST_ADDRESS = 0xFF
+PDU2_MIN_FORMAT = 240  # PDU format values from here on are broadcast (PDU2) PGNs
+CAN_ID_CACHE_SIZE = 1024  # A bus uses a few hundred distinct frame IDs at most
+DATA_OFFSET = 6  # 0xAA, type byte and the 4 byte frame ID come before the data
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=CAN_ID_CACHE_SIZE)
+def decode_can_id(can_id):
+    """
+    Splits a 29 bit CAN ID into (pgn, priority, source, destination).
+
+    For PDU1 PGNs (PDU format below 240) the PDU specific byte is the destination address
+    and not part of the PGN. PDU2 PGNs are always broadcast.
+    """
+    pdu_format = (can_id >> 16) & 0xFF
+    if pdu_format < PDU2_MIN_FORMAT:
+        pgn = (can_id >> 8) & 0x3FF00
+        destination = (can_id >> 8) & 0xFF
+    else:
+        pgn = (can_id >> 8) & 0x3FFFF
+        destination = BROADCAST_ADDRESS
+    return pgn, (can_id >> 26) & 0x7, can_id & 0xFF, destination
+
+
+class CanFrame:
+    """
+    One NMEA 2000 CAN frame, as handed from the framer to the PGN dispatch.
+
+    destination is the address a PDU1 frame was sent to, BROADCAST_ADDRESS otherwise.
+    data holds the payload bytes in the order they were received, which is what the
+    decoders take.
+    """
+
+    __slots__ = ("pgn", "source", "priority", "destination", "data")
+
+    def __init__(self, pgn, source, priority, destination, data):
+        self.pgn = pgn
+        self.source = source
+        self.priority = priority
+        self.destination = destination
+        self.data = data
+
+    @classmethod
+    def from_packet(cls, packet):
+        """Builds the frame of an extended framed packet (0xAA, type, ID, data, 0x55)."""
+        pgn, priority, source, destination = decode_can_id(int.from_bytes(packet[2:DATA_OFFSET], byteorder='little'))
+        data = bytes(packet[DATA_OFFSET:DATA_OFFSET + (packet[1] & TYPE_LENGTH_MASK)])
+        return cls(pgn, source, priority, destination, data)
+
+    def __repr__(self):
+        return (
+            f"CanFrame(pgn={self.pgn}, source={self.source}, priority={self.priority}, "
+            f"destination={self.destination}, data={self.data.hex()})"
+        )
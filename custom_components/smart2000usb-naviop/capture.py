@@ -0,0 +1,251 @@
+"""
+Copyright (c) 2024 Smart Boat Innovations
+
+Version 1.0, 01 June 2024
+
+This file is part of the Smart Boat Innovations software.
+
+Smart Boat Innovations ("Licensor") grants you a limited, non-exclusive, non-transferable, revocable license to load and use this software through Home Assistant Community Store (HACS) for personal, non-commercial use only.
+
+You may not copy, distribute, or modify this file or the accompanying software. The software is provided "as is", without warranty of any kind, express or implied, including but not limited to the warranties of merchantability, fitness for a particular purpose and noninfringement. In no event shall the authors or copyright holders be liable for any claim, damages or other liability, whether in an action of contract, tort or otherwise, arising from, out of or in connection with the software or the use or other dealings in the software.
+
+See the full license text in the accompanying LICENSE file.
+"""
+
+# Standard Library Imports
+from datetime import datetime
+import gzip
+import logging
+import os
+import struct
+import threading
+import time
+
+from .framer import EXTENDED_ID_LENGTH, STANDARD_ID_LENGTH, TYPE_EXTENDED_FLAG
+
+# File layout: a header followed by one record per frame.
+# Header: magic, format version, wall clock time and monotonic time (ns) when the file was opened.
+# Record: monotonic time (ns), CAN ID, payload length, payload bytes. The CAN ID holds the
+# 29 bit ID of extended frames, or the 11 bit ID of standard frames with CAPTURE_STANDARD_FLAG set.
+CAPTURE_MAGIC = b"S2KCAP"
+CAPTURE_VERSION = 1
+CAPTURE_HEADER = struct.Struct("<6sBdQ")
+CAPTURE_RECORD = struct.Struct("<QIB")
+CAPTURE_EXTENSION = ".s2kcap"
+COMPRESSED_EXTENSION = ".gz"
+CAPTURE_STANDARD_FLAG = 0x80000000
+EXTENDED_ID_MASK = 0x1FFFFFFF
+STANDARD_ID_MASK = 0x7FF
+ID_OFFSET = 2  # Start byte and type byte come before the frame ID
+
+DEFAULT_MAX_SIZE = 64 * 1024 * 1024  # Bytes written before a new file is started
+DEFAULT_ROTATE_INTERVAL = 3600  # Seconds before a new file is started
+DEFAULT_FLUSH_INTERVAL = 5  # Seconds between flushes of the write buffer
+DEFAULT_MAX_PENDING = 65536  # Frames waiting for the writer thread before new ones are dropped
+WRITE_INTERVAL = 0.5  # Seconds the writer thread collects frames before writing them
+WRITE_BUFFER_SIZE = 256 * 1024
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def packet_record(packet):
+    """Returns (capture CAN ID, payload) of a framed packet, standard or extended."""
+    if packet[1] & TYPE_EXTENDED_FLAG:
+        data_offset = ID_OFFSET + EXTENDED_ID_LENGTH
+        can_id = int.from_bytes(packet[ID_OFFSET:data_offset], byteorder='little') & EXTENDED_ID_MASK
+    else:
+        data_offset = ID_OFFSET + STANDARD_ID_LENGTH
+        can_id = int.from_bytes(packet[ID_OFFSET:data_offset], byteorder='little') & STANDARD_ID_MASK | CAPTURE_STANDARD_FLAG
+    return can_id, bytes(packet[data_offset:-1])
+
+
+class CaptureRecorder:
+    """
+    Appends every raw frame to a compact binary capture file.
+
+    record() only queues the frame: a writer thread, started with the first frame, does
+    all file I/O, so opening, rotating, compressing and flushing files never stalls the
+    reader on a slow disk. When max_pending frames are waiting for the writer, new frames
+    are dropped and counted.
+
+    Records go through a large write buffer that is flushed every flush_interval seconds.
+    A new file is started once max_size bytes of records have gone into the current one or
+    rotate_interval seconds have passed. With compress set, files are written gzip
+    compressed. Once closed, the recorder ignores further frames and the writer thread
+    writes the frames still waiting, closes the file and exits.
+    """
+
+    def __init__(
+        self,
+        directory,
+        name,
+        max_size=DEFAULT_MAX_SIZE,
+        rotate_interval=DEFAULT_ROTATE_INTERVAL,
+        compress=False,
+        flush_interval=DEFAULT_FLUSH_INTERVAL,
+        max_pending=DEFAULT_MAX_PENDING,
+    ):
+        self._directory = directory
+        self._name = name
+        self._max_size = max_size
+        self._rotate_interval = rotate_interval
+        self._compress = compress
+        self._flush_interval = flush_interval
+        self._max_pending = max_pending
+        self._lock = threading.Lock()
+        self._pending = []
+        self._writer = None
+        self._stop_event = threading.Event()
+
+        self._file = None
+        self._closed = False
+        self._written = 0
+        self._opened_at = 0.0
+        self._flushed_at = 0.0
+
+        self.path = None
+        self.frames = 0
+        self.files = 0
+        self.errors = 0
+        self.dropped = 0
+
+    def record(self, packet):
+        """Queue one framed packet (0xAA ... 0x55) for the capture."""
+        timestamp = time.monotonic_ns()
+        can_id, payload = packet_record(packet)
+
+        with self._lock:
+            if self._closed:
+                return
+            if len(self._pending) >= self._max_pending:
+                self.dropped += 1
+                return
+
+            self._pending.append((timestamp, can_id, payload))
+            if self._writer is None:
+                # Not a daemon, so the frames still waiting are written when Home Assistant exits
+                self._writer = threading.Thread(target=self._run, name="smart2000usb_capture")
+                self._writer.start()
+
+    def _run(self):
+        """Writes the queued frames every WRITE_INTERVAL until closed."""
+        while True:
+            stopping = self._stop_event.wait(WRITE_INTERVAL)
+            with self._lock:
+                records, self._pending = self._pending, []
+            if records:
+                self._write(records)
+            if stopping:
+                break
+
+        self._close_file()
+        _LOGGER.debug("Capture writer finished")
+
+    def _write(self, records):
+        """Appends records to the capture file, runs on the writer thread."""
+        try:
+            for timestamp, can_id, payload in records:
+                now = timestamp / 1e9
+                if self._file is None or self._written >= self._max_size or now - self._opened_at >= self._rotate_interval:
+                    self._rotate(now)
+
+                self._file.write(CAPTURE_RECORD.pack(timestamp, can_id, len(payload)))
+                self._file.write(payload)
+                self._written += CAPTURE_RECORD.size + len(payload)
+                self.frames += 1
+
+            if now - self._flushed_at >= self._flush_interval:
+                self._file.flush()
+                self._flushed_at = now
+        except OSError as exc:
+            # Never let a full disk take the capture down with it, the next batch opens a new file
+            self.errors += 1
+            _LOGGER.error("Error writing capture file %s: %s", self.path, exc)
+            self._close_file()
+
+    def _rotate(self, now):
+        """Close the current capture file and start a new one."""
+        self._close_file()
+
+        os.makedirs(self._directory, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        path = os.path.join(self._directory, f"{self._name}_{stamp}_{self.files:04d}{CAPTURE_EXTENSION}")
+
+        if self._compress:
+            path += COMPRESSED_EXTENSION
+            self._file = gzip.open(path, "ab")
+        else:
+            self._file = open(path, "ab", buffering=WRITE_BUFFER_SIZE)
+
+        self._file.write(CAPTURE_HEADER.pack(CAPTURE_MAGIC, CAPTURE_VERSION, time.time(), int(now * 1e9)))
+        self.path = path
+        self.files += 1
+        self._written = CAPTURE_HEADER.size
+        self._opened_at = now
+        self._flushed_at = now
+        _LOGGER.debug("Recording raw frames to %s", path)
+
+    def _close_file(self):
+        """Flush and close the current capture file, if any."""
+        if self._file is None:
+            return
+
+        try:
+            self._file.close()
+        except OSError as exc:
+            self.errors += 1
+            _LOGGER.error("Error closing capture file %s: %s", self.path, exc)
+        self._file = None
+
+    def close(self):
+        """Stop recording, the writer thread finishes the capture without being waited for."""
+        with self._lock:
+            self._closed = True
+        self._stop_event.set()
+
+    def stats(self):
+        """Returns the recorder counters."""
+        return {
+            "capture_file": self.path,
+            "capture_frames": self.frames,
+            "capture_files": self.files,
+            "capture_errors": self.errors,
+            "capture_dropped": self.dropped,
+        }
+
+
+def open_capture(path):
+    """Opens a capture file for reading, transparently handling compressed files."""
+    if path.endswith(COMPRESSED_EXTENSION):
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+
+def iter_capture(path):
+    """
+    Yields (monotonic_ns, can_id, payload) for every record in a capture file.
+
+    A truncated last record, as left behind by a power cut, ends the iteration quietly.
+    """
+    with open_capture(path) as file:
+        header = file.read(CAPTURE_HEADER.size)
+        if len(header) < CAPTURE_HEADER.size:
+            return
+
+        magic, version, _wall_time, _monotonic_ns = CAPTURE_HEADER.unpack(header)
+        if magic != CAPTURE_MAGIC or version != CAPTURE_VERSION:
+            raise ValueError(f"{path} is not a Smart2000 capture file")
+
+        record_size = CAPTURE_RECORD.size
+        unpack = CAPTURE_RECORD.unpack
+        while True:
+            record = file.read(record_size)
+            if len(record) < record_size:
+                return
+
+            timestamp, can_id, length = unpack(record)
+            payload = file.read(length)
+            if len(payload) < length:
+                return
+
+            yield timestamp, can_id, payload
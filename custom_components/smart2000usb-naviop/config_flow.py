@@ -29,8 +29,23 @@ class Smart2000USBConfigFlow(config_entries.ConfigFlow, domain="smart2000usb-nav
                 vol.Required("name"): str,
                 vol.Required("serial_port", default="/dev/ttyUSB0"): str,
                 vol.Required("baudrate", default=2000000): int,
+                vol.Required("transport", default="stream"): vol.In(["stream", "protocol"]),
+                vol.Required("execution_mode", default="event_loop"): vol.In(["event_loop", "thread"]),
+                vol.Required("queue_size", default=2048): vol.All(int, vol.Range(min=16)),
+                vol.Required("overload_policy", default="drop_oldest"): vol.In(["drop_oldest", "drop_priority", "coalesce"]),
                 vol.Optional("pgn_include"): str,
                 vol.Optional("pgn_exclude"): str,
+                vol.Optional("pgn_high_priority"): str,
+                vol.Optional("pgn_low_priority"): str,
+                vol.Optional("field_include"): str,
+                vol.Optional("field_exclude"): str,
+                vol.Optional("capture_dir"): str,
+                vol.Required("capture_max_size", default=64): vol.All(int, vol.Range(min=1)),
+                vol.Required("capture_rotate_minutes", default=60): vol.All(int, vol.Range(min=1)),
+                vol.Required("capture_compress", default=False): bool,
+                vol.Optional("replay_path"): str,
+                vol.Required("replay_speed", default=1.0): vol.All(vol.Coerce(float), vol.Range(min=0)),
+                vol.Required("expose_reserved", default=False): bool,
             }),
             errors=errors,
         )
@@ -80,8 +95,23 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
             defaults = {
                 "serial_port": current_data.get("serial_port", "/dev/ttyUSB0"),
                 "baudrate": current_data.get("baudrate", 2000000),
+                "transport": current_data.get("transport", "stream"),
+                "execution_mode": current_data.get("execution_mode", "event_loop"),
+                "queue_size": current_data.get("queue_size", 2048),
+                "overload_policy": current_data.get("overload_policy", "drop_oldest"),
                 "pgn_include": "   " + current_data.get("pgn_include", "").lstrip(),
                 "pgn_exclude": "   " + current_data.get("pgn_exclude", "").lstrip(),
+                "pgn_high_priority": "   " + current_data.get("pgn_high_priority", "").lstrip(),
+                "pgn_low_priority": "   " + current_data.get("pgn_low_priority", "").lstrip(),
+                "field_include": "   " + current_data.get("field_include", "").lstrip(),
+                "field_exclude": "   " + current_data.get("field_exclude", "").lstrip(),
+                "capture_dir": current_data.get("capture_dir", ""),
+                "capture_max_size": current_data.get("capture_max_size", 64),
+                "capture_rotate_minutes": current_data.get("capture_rotate_minutes", 60),
+                "capture_compress": current_data.get("capture_compress", False),
+                "replay_path": current_data.get("replay_path", ""),
+                "replay_speed": current_data.get("replay_speed", 1.0),
+                "expose_reserved": current_data.get("expose_reserved", False),
             }
 
             _LOGGER.debug("Form defaults: %s", defaults)
@@ -91,7 +121,22 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
                 data_schema=vol.Schema({
                     vol.Required("serial_port", default=defaults["serial_port"]): str,
                     vol.Required("baudrate", default=defaults["baudrate"]): int,
+                    vol.Required("transport", default=defaults["transport"]): vol.In(["stream", "protocol"]),
+                    vol.Required("execution_mode", default=defaults["execution_mode"]): vol.In(["event_loop", "thread"]),
+                    vol.Required("queue_size", default=defaults["queue_size"]): vol.All(int, vol.Range(min=16)),
+                    vol.Required("overload_policy", default=defaults["overload_policy"]): vol.In(["drop_oldest", "drop_priority", "coalesce"]),
                     vol.Optional("pgn_include", default=defaults["pgn_include"]): str,
                     vol.Optional("pgn_exclude", default=defaults["pgn_exclude"]): str,
+                    vol.Optional("pgn_high_priority", default=defaults["pgn_high_priority"]): str,
+                    vol.Optional("pgn_low_priority", default=defaults["pgn_low_priority"]): str,
+                    vol.Optional("field_include", default=defaults["field_include"]): str,
+                    vol.Optional("field_exclude", default=defaults["field_exclude"]): str,
+                    vol.Optional("capture_dir", default=defaults["capture_dir"]): str,
+                    vol.Required("capture_max_size", default=defaults["capture_max_size"]): vol.All(int, vol.Range(min=1)),
+                    vol.Required("capture_rotate_minutes", default=defaults["capture_rotate_minutes"]): vol.All(int, vol.Range(min=1)),
+                    vol.Required("capture_compress", default=defaults["capture_compress"]): bool,
+                    vol.Optional("replay_path", default=defaults["replay_path"]): str,
+                    vol.Required("replay_speed", default=defaults["replay_speed"]): vol.All(vol.Coerce(float), vol.Range(min=0)),
+                    vol.Required("expose_reserved", default=defaults["expose_reserved"]): bool,
                 }),
             )
@@ -0,0 +1,390 @@
+"""
+Copyright (c) 2024 Smart Boat Innovations
+
+Version 1.0, 01 June 2024
+
+This file is part of the Smart Boat Innovations software.
+
+Smart Boat Innovations ("Licensor") grants you a limited, non-exclusive, non-transferable, revocable license to load and use this software through Home Assistant Community Store (HACS) for personal, non-commercial use only.
+
+You may not copy, distribute, or modify this file or the accompanying software. The software is provided "as is", without warranty of any kind, express or implied, including but not limited to the warranties of merchantability, fitness for a particular purpose and noninfringement. In no event shall the authors or copyright holders be liable for any claim, damages or other liability, whether in an action of contract, tort or otherwise, arising from, out of or in connection with the software or the use or other dealings in the software.
+
+See the full license text in the accompanying LICENSE file.
+"""
+
+# Standard Library Imports
+import functools
+import json
+import logging
+import os
+import struct
+import sys
+
+from .utils import (
+    decode_date,
+    decode_decimal,
+    decode_float,
+    decode_time,
+    kelvin_to_celsius,
+    kelvin_to_fahrenheit,
+    mps_to_knots,
+    radians_to_degrees,
+)
+
+PGN_FIELDS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pgn_fields")
+PGN_LOOKUPS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pgn_lookups.json")
+
+# The descriptors are split into one file per group of 256 PGNs (the data page and PDU
+# format), so only the groups of PGNs seen on the bus are loaded
+GROUP_SHIFT = 8
+
+# Columns of a field descriptor in pgn_fields/, an optional dict of options follows
+NAME, DESCRIPTION, OFFSET, BITS, RESOLUTION, SIGNED, TYPE, UNIT = range(8)
+
+# Fields that are not decoded
+SKIPPED_TYPES = frozenset(["STRING_FIX", "STRING_LZ"])
+MAX_FIELD_BITS = 256
+
+# Fields without meaning, only decoded when reserved fields are exposed for protocol work
+RESERVED_TYPES = frozenset(["RESERVED", "SPARE"])
+
+# How the raw value of a field is read from the payload bytes: from the values unpacked by
+# the struct of its layout (byte aligned 8, 16, 32 and 64 bit fields), from the one byte
+# holding it, or from the slice of bytes it spans
+EXTRACT_STRUCT = 0
+EXTRACT_BYTE = 1
+EXTRACT_SLICE = 2
+
+STRUCT_FORMATS = {8: "B", 16: "H", 32: "I", 64: "Q"}
+
+# How the raw value of a field becomes the published value
+VALUE_SCALED = 0
+VALUE_TIME = 1
+VALUE_DATE = 2
+VALUE_FLOAT = 3
+VALUE_DECIMAL = 4
+VALUE_LOOKUP = 5
+
+VALUE_KINDS = {
+    "TIME": VALUE_TIME,
+    "DATE": VALUE_DATE,
+    "FLOAT": VALUE_FLOAT,
+    "DECIMAL": VALUE_DECIMAL,
+}
+
+# Extra units a field is published in: name suffix, description suffix, unit, conversion
+CONVERSIONS = {
+    "celsius": ("_celsius", " Celsius", "C", kelvin_to_celsius),
+    "fahrenheit": ("_fahrenheit", " Fahrenheit", "F", kelvin_to_fahrenheit),
+    "degrees": ("_degrees", " Degrees", "Deg", radians_to_degrees),
+    "knots": ("_knots", " Knots", "Kn", mps_to_knots),
+}
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class FieldDecoder:
+    """
+    One field of a PGN with its position in the payload, mask, scale and null value
+    precomputed.
+
+    Only the bytes spanned by the field are read, start to end (exclusive), and shifted
+    right by shift. NUMBER fields have the NMEA 2000 "not available" value (all bits set)
+    and for 4 bits or more the "error" value (one less) decoded as None. Signed fields are
+    stored in two's complement. LOOKUP fields with an enumeration in pgn_lookups.json have
+    its names as a tuple indexed by the raw value (None for values without a name).
+
+    Every field of every loaded PGN has one, so only what decoding needs is kept and the
+    texts repeated across PGNs (reserved, instance, ...) are interned.
+    """
+
+    __slots__ = ("name", "description", "unit", "start", "end", "shift", "reserved", "mask",
+                 "null_from", "sign_bit", "resolution", "kind", "names", "conversions")
+
+    def __init__(self, descriptor, lookups):
+        bits = descriptor[BITS]
+        options = descriptor[UNIT + 1] if len(descriptor) > UNIT + 1 else {}
+
+        offset = descriptor[OFFSET]
+
+        self.name = sys.intern(descriptor[NAME])
+        self.description = sys.intern(descriptor[DESCRIPTION])
+        self.unit = sys.intern(descriptor[UNIT])
+        self.start = offset // 8
+        self.end = (offset + bits + 7) // 8
+        self.shift = offset % 8
+        self.reserved = descriptor[TYPE] in RESERVED_TYPES
+        self.mask = (1 << bits) - 1
+        self.resolution = descriptor[RESOLUTION]
+        self.kind = VALUE_KINDS.get(descriptor[TYPE], VALUE_SCALED)
+        self.names = lookups.get(options.get("lookup"))
+        if self.names is not None:
+            self.kind = VALUE_LOOKUP
+
+        # Raw values from null_from on are not available, which only NUMBER fields have
+        if descriptor[TYPE] != "NUMBER":
+            self.null_from = self.mask + 1
+        elif bits <= 3:
+            self.null_from = self.mask
+        else:
+            self.null_from = self.mask - 1
+
+        self.sign_bit = 1 << (bits - 1) if descriptor[SIGNED] and self.kind != VALUE_FLOAT else 0
+
+        self.conversions = tuple(
+            (self.name + name_suffix, self.description + description_suffix, unit, convert)
+            for name_suffix, description_suffix, unit, convert in (CONVERSIONS[name] for name in options.get("convert", ()))
+        )
+
+
+class FieldLayout:
+    """
+    The fields of a PGN that are decoded, and how each is read from the payload bytes.
+
+    steps holds (field, extract, index) in field order. The byte aligned fields of 8 to 64
+    bits are read with one struct unpack (index is their position in its values), the
+    others from the bytes they span, so the cost of a field does not grow with the length
+    of the payload. Fields left out of the layout are not read at all. size is the payload
+    length the fields need, of a shorter payload only the fields it holds are published.
+    """
+
+    __slots__ = ("steps", "size", "unpack_from")
+
+    def __init__(self, fields):
+        self.size = max((field.end for field in fields), default=0)
+
+        format_string = "<"
+        position = 0
+        indexes = {}
+        for field in sorted(fields, key=lambda field: (field.start, field.shift)):
+            bits = field.mask.bit_length()
+            if field.shift or bits not in STRUCT_FORMATS or field.start < position:
+                continue
+            format_string += "x" * (field.start - position) + STRUCT_FORMATS[bits]
+            position = field.end
+            indexes[field] = len(indexes)
+        self.unpack_from = compile_struct(format_string).unpack_from if indexes else None
+
+        self.steps = tuple(
+            (field, EXTRACT_STRUCT, indexes[field]) if field in indexes
+            else (field, EXTRACT_BYTE if field.end - field.start == 1 else EXTRACT_SLICE, None)
+            for field in fields
+        )
+
+    def __len__(self):
+        return len(self.steps)
+
+
+@functools.lru_cache(maxsize=None)
+def compile_struct(format_string):
+    """Returns the Struct of a format, shared by the layouts of PGNs with the same fields."""
+    return struct.Struct(format_string)
+
+
+class PgnDecoder:
+    """
+    Decodes one PGN (variant) from its field descriptors and publishes its fields.
+
+    Instances are called like the generated process_pgn_* functions they replace, with the
+    payload bytes and optionally the layout of the fields to publish (see FieldSelection).
+    The default layout leaves out reserved and spare fields, all_fields holds them and is
+    only compiled once asked for. Fields with an enumeration publish the name of their
+    value, with the raw value as attribute. match holds the (offset, length, value) of the
+    fields identifying the variant.
+    """
+
+    __slots__ = ("pgn", "description", "fields", "match", "pgn_id", "layout", "_all_fields", "size")
+
+    def __init__(self, pgn, description, descriptors, lookups=None):
+        if lookups is None:
+            lookups = load_lookups()
+
+        self.pgn = pgn
+        self.description = sys.intern(description)
+        self.pgn_id = str(pgn)
+        self.fields = tuple(
+            FieldDecoder(descriptor, lookups)
+            for descriptor in descriptors
+            if descriptor[TYPE] not in SKIPPED_TYPES and descriptor[BITS] <= MAX_FIELD_BITS
+        )
+        self.match = {
+            descriptor[NAME]: (descriptor[OFFSET], descriptor[BITS], descriptor[UNIT + 1]["match"])
+            for descriptor in descriptors
+            if len(descriptor) > UNIT + 1 and "match" in descriptor[UNIT + 1]
+        }
+        self.layout = FieldLayout([field for field in self.fields if not field.reserved])
+        self._all_fields = self.layout if len(self.layout) == len(self.fields) else None
+        self.size = max((field.end for field in self.fields), default=0)  # Payload length all fields need
+
+    @property
+    def all_fields(self):
+        """The layout of all fields, reserved and spare ones included."""
+        if self._all_fields is None:
+            self._all_fields = FieldLayout(self.fields)
+        return self._all_fields
+
+    def __call__(self, hass, instance_name, data, layout=None):
+        from .sensor import publish_field
+
+        if layout is None:
+            layout = self.layout
+        steps = layout.steps
+        if len(data) < layout.size:
+            # Fields beyond the end were not sent, the padding only keeps the unpack in bounds
+            steps = [step for step in steps if step[0].end <= len(data)]
+            data = bytes(data).ljust(layout.size, b"\xff")
+        values = layout.unpack_from(data) if layout.unpack_from is not None else ()
+
+        description = self.description
+        pgn_id = self.pgn_id
+        for field, extract, index in steps:
+            if extract == EXTRACT_STRUCT:
+                raw = values[index]
+            elif extract == EXTRACT_BYTE:
+                raw = (data[field.start] >> field.shift) & field.mask
+            else:
+                raw = (int.from_bytes(data[field.start:field.end], "little") >> field.shift) & field.mask
+            if raw >= field.null_from:
+                value = None
+            else:
+                if raw & field.sign_bit:
+                    raw -= field.sign_bit << 1
+                kind = field.kind
+                if kind == VALUE_SCALED:
+                    value = raw * field.resolution
+                elif kind == VALUE_LOOKUP:
+                    names = field.names
+                    value = names[raw] if raw < len(names) else None
+                    if value is None:
+                        value = raw
+                elif kind == VALUE_TIME:
+                    value = decode_time(raw * field.resolution)
+                elif kind == VALUE_DATE:
+                    value = decode_date(raw * field.resolution)
+                elif kind == VALUE_FLOAT:
+                    value = decode_float(raw) * field.resolution
+                else:
+                    value = decode_decimal(raw) * field.resolution
+
+            if field.names is None:
+                publish_field(hass, instance_name, field.name, field.description, value, description, field.unit, pgn_id)
+            else:
+                publish_field(hass, instance_name, field.name, field.description, value, description, field.unit, pgn_id, raw)
+            for name, field_description, unit, convert in field.conversions:
+                publish_field(hass, instance_name, name, field_description, convert(value), description, unit, pgn_id)
+
+    def __repr__(self):
+        return f"PgnDecoder(pgn={self.pgn}, description={self.description!r}, fields={len(self.fields)})"
+
+
+class FieldSelection:
+    """
+    The fields an instance publishes, compiled into one FieldLayout per decoder.
+
+    include and exclude map a PGN to the names of its fields to publish or leave out,
+    from selectors like 127489.oil_pressure. A PGN with included fields publishes only
+    those (reserved ones too when named), other PGNs all their fields but the excluded
+    ones. Conversions follow the field they convert. Layouts are compiled when a decoder
+    is first used, decoders without selectors share their own layouts.
+    """
+
+    __slots__ = ("include", "exclude", "expose_reserved", "layouts")
+
+    def __init__(self, include=None, exclude=None, expose_reserved=False):
+        self.include = include or {}
+        self.exclude = exclude or {}
+        self.expose_reserved = expose_reserved
+        self.layouts = {}
+
+    def layout(self, decoder):
+        """Returns the layout of the fields of a decoder this instance publishes."""
+        layout = self.layouts.get(decoder)
+        if layout is None:
+            layout = self.layouts[decoder] = self.compile(decoder)
+        return layout
+
+    def compile(self, decoder):
+        included = self.include.get(decoder.pgn)
+        excluded = self.exclude.get(decoder.pgn, ())
+        if included is None and not excluded:
+            return decoder.all_fields if self.expose_reserved else decoder.layout
+
+        return FieldLayout([
+            field
+            for field in decoder.fields
+            if field.name not in excluded
+            and (field.name in included if included is not None else self.expose_reserved or not field.reserved)
+        ])
+
+
+def parse_field_selectors(text):
+    """
+    Returns the comma separated PGN.field selectors of a text as pgn -> frozenset of
+    field names. Malformed selectors are logged and left out.
+    """
+    selectors = {}
+    for selector in text.split(","):
+        selector = selector.strip()
+        if not selector:
+            continue
+        pgn, _, name = selector.partition(".")
+        try:
+            pgn = int(pgn)
+        except ValueError:
+            pgn = None
+        if pgn is None or not name.strip():
+            _LOGGER.error(f"Invalid field selector found: '{selector}' in input '{text}', expected PGN.field.")
+            continue
+        selectors.setdefault(pgn, set()).add(name.strip().lower())
+    return {pgn: frozenset(names) for pgn, names in selectors.items()}
+
+
+def group_of(pgn):
+    """Returns the group of a PGN, the first PGN of the group identifies its file."""
+    return pgn >> GROUP_SHIFT << GROUP_SHIFT
+
+
+def group_path(group, directory=PGN_FIELDS_DIR):
+    return os.path.join(directory, f"{group}.json")
+
+
+@functools.lru_cache(maxsize=None)
+def load_lookups(path=PGN_LOOKUPS_PATH):
+    """
+    Returns the enumerations of pgn_lookups.json as name -> tuple of value names, indexed
+    by the raw value. Loaded once, an unreadable file is logged and gives no names.
+    """
+    try:
+        with open(path, "r") as file:
+            lookup_data = json.load(file)
+    except Exception as e:
+        _LOGGER.error(f"Error loading {path}: {e}")
+        return {}
+
+    lookups = {}
+    for name, values in lookup_data["Lookups"].items():
+        names = [None] * (max(value for value, _ in values) + 1)
+        for value, value_name in values:
+            names[value] = value_name
+        lookups[name] = tuple(names)
+    return lookups
+
+
+def load_decoders(path):
+    """
+    Returns a PgnDecoder for every PGN definition in a file of pgn_fields/, in file order.
+
+    A PGN can have several definitions, told apart by the match values of their fields.
+    An unreadable file is logged and gives no decoders.
+    """
+    try:
+        with open(path, "r") as file:
+            field_data = json.load(file)
+    except Exception as e:
+        _LOGGER.error(f"Error loading {path}: {e}")
+        return []
+
+    return [
+        PgnDecoder(definition["pgn"], definition["description"], definition["fields"])
+        for definition in field_data["PGNs"]
+    ]
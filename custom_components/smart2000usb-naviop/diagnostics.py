@@ -0,0 +1,54 @@
+"""
+Copyright (c) 2024 Smart Boat Innovations
+
+Version 1.0, 01 June 2024
+
+This file is part of the Smart Boat Innovations software.
+
+Smart Boat Innovations ("Licensor") grants you a limited, non-exclusive, non-transferable, revocable license to load and use this software through Home Assistant Community Store (HACS) for personal, non-commercial use only.
+
+You may not copy, distribute, or modify this file or the accompanying software. The software is provided "as is", without warranty of any kind, express or implied, including but not limited to the warranties of merchantability, fitness for a particular purpose and noninfringement. In no event shall the authors or copyright holders be liable for any claim, damages or other liability, whether in an action of contract, tort or otherwise, arising from, out of or in connection with the software or the use or other dealings in the software.
+
+See the full license text in the accompanying LICENSE file.
+"""
+
+# Standard Library Imports
+import logging
+
+# Home Assistant Imports
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_NAME
+from homeassistant.core import HomeAssistant
+
+_LOGGER = logging.getLogger(__name__)
+
+
+async def async_get_config_entry_diagnostics(hass: HomeAssistant, entry: ConfigEntry) -> dict:
+    """Return the state of the decoder for the diagnostics download."""
+    name = entry.data[CONF_NAME]
+    fast_packet_key = f"{name}_fast_packet_key"
+
+    diagnostics = {"config": dict(entry.data)}
+
+    assembler = hass.data.get(fast_packet_key)
+    if assembler:
+        diagnostics["fast_packet"] = assembler.stats()
+        diagnostics["fast_packet_sessions"] = assembler.snapshot()
+
+    unknown_pgns = hass.data.get(f"{name}_unknown_pgns_key")
+    if unknown_pgns is not None:
+        diagnostics["unknown_pgns"] = dict(unknown_pgns.most_common())
+
+    unmatched_pgns = hass.data.get(f"{name}_unmatched_pgns_key")
+    if unmatched_pgns is not None:
+        diagnostics["unmatched_pgns"] = dict(unmatched_pgns.most_common())
+
+    short_frames = hass.data.get(f"{name}_short_frames_key")
+    if short_frames is not None:
+        diagnostics["short_frames"] = dict(short_frames.most_common())
+
+    transport = hass.data.get(f"{name}_transport_key")
+    if transport:
+        diagnostics["transport"] = transport.stats()
+
+    return diagnostics
@@ -0,0 +1,313 @@
+"""
+Copyright (c) 2024 Smart Boat Innovations
+
+Version 1.0, 01 June 2024
+
+This file is part of the Smart Boat Innovations software.
+
+Smart Boat Innovations ("Licensor") grants you a limited, non-exclusive, non-transferable, revocable license to load and use this software through Home Assistant Community Store (HACS) for personal, non-commercial use only.
+
+You may not copy, distribute, or modify this file or the accompanying software. The software is provided "as is", without warranty of any kind, express or implied, including but not limited to the warranties of merchantability, fitness for a particular purpose and noninfringement. In no event shall the authors or copyright holders be liable for any claim, damages or other liability, whether in an action of contract, tort or otherwise, arising from, out of or in connection with the software or the use or other dealings in the software.
+
+See the full license text in the accompanying LICENSE file.
+"""
+
+# Standard Library Imports
+from collections import Counter
+import json
+import logging
+import os
+import threading
+import time
+from types import MappingProxyType
+from typing import Callable, Mapping, NamedTuple, Optional
+
+from .backpressure import is_proprietary_pgn
+from .decoder import GROUP_SHIFT, PGN_FIELDS_DIR, group_of, group_path, load_decoders
+from .framer import TYPE_EXTENDED_FLAG
+from .iso_tp import PGN_TP_CM, TP_CM_BAM, TP_CM_RTS
+
+FRAME_SINGLE = "Single"
+FRAME_FAST = "Fast"
+FRAME_ISO = "ISO"  # Only sent through the ISO transport protocol
+
+PGN_TYPE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pgn_type.json")
+
+# Every proprietary PGN starts with the manufacturer code (11 bits) and the industry code
+# (3 bits after 2 reserved bits)
+MANUFACTURER_FIELD = "manufacturer_code"
+INDUSTRY_FIELD = "industry_code"
+MANUFACTURER_MASK = 0x7FF
+INDUSTRY_SHIFT = 13
+INDUSTRY_MASK = 0x7
+
+# The group of a PGN is the data page and PDU format, bits 16 to 25 of the CAN ID (bytes 4
+# and 5 of a packet) whether the PDU specific byte is a destination or not
+PACKET_GROUP_MASK = 0x3FF << GROUP_SHIFT
+
+# A TP.CM BAM or RTS names the PGN its TP.DT frames carry in data bytes 5 to 7, packet
+# bytes 11 to 13 after the start, type and 4 ID bytes
+TP_CM_GROUP = group_of(PGN_TP_CM)
+TP_CM_ANNOUNCES = frozenset([TP_CM_BAM, TP_CM_RTS])
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class VariantTable:
+    """
+    The decoders sharing a PGN (and for proprietary PGNs a manufacturer), told apart by
+    the values of their match fields.
+
+    Variants matching on the same fields share one dict keyed on the tuple of field
+    values, so a lookup costs one dict access per distinct set of match fields. Sets with
+    more fields are tried first, which lets e.g. the Airmar speed filter variants (matching
+    on proprietary ID and filter type) take precedence over the plain proprietary ID ones.
+    A variant without match fields is the default.
+    """
+
+    __slots__ = ("rules", "default")
+
+    def __init__(self):
+        self.rules = []  # [((start, end, shift, mask), ...), {(value, ...): decoder}]
+        self.default = None
+
+    def add(self, fields, decoder):
+        """Adds a decoder for frames where each (offset, length, value) field holds value."""
+        if not fields:
+            self.default = decoder
+            return
+
+        positions = tuple(
+            (offset // 8, (offset + length + 7) // 8, offset % 8, (1 << length) - 1) for offset, length, _ in fields
+        )
+        values = tuple(value for _, _, value in fields)
+        for rule_positions, variants in self.rules:
+            if rule_positions == positions:
+                variants[values] = decoder
+                return
+        self.rules.append((positions, {values: decoder}))
+        self.rules.sort(key=lambda rule: len(rule[0]), reverse=True)
+
+    def select(self, data):
+        """Returns the decoder of the variant matching the payload bytes, or the default."""
+        for positions, variants in self.rules:
+            decoder = variants.get(tuple(
+                (int.from_bytes(data[start:end], "little") >> shift) & mask for start, end, shift, mask in positions
+            ))
+            if decoder is not None:
+                return decoder
+        return self.default
+
+    def decoders(self):
+        """Returns the decoders of all variants."""
+        decoders = [decoder for _, variants in self.rules for decoder in variants.values()]
+        if self.default is not None:
+            decoders.append(self.default)
+        return decoders
+
+
+class PgnEntry(NamedTuple):
+    """
+    How frames of a PGN are handled.
+
+    decoder is used for PGNs with a single definition. PGNs defined more than once are
+    decoded by the variant selected from variants, and for proprietary PGNs first from
+    manufacturers, keyed on (manufacturer code, industry code). min_size is the payload
+    length the shortest definition needs, single frames shorter than it are not decoded.
+    """
+
+    pgn: int
+    frame_type: str
+    decoder: Optional[Callable]
+    proprietary: bool
+    manufacturers: Optional[Mapping] = None
+    variants: Optional[VariantTable] = None
+    min_size: int = 0
+
+    def select_decoder(self, data):
+        """
+        Returns the decoder for the payload bytes, or None if they are from a manufacturer
+        or of a variant there is no decoder for.
+        """
+        table = self.variants
+        if self.manufacturers is not None:
+            header = int.from_bytes(data[:2], "little")
+            table = self.manufacturers.get((header & MANUFACTURER_MASK, (header >> INDUSTRY_SHIFT) & INDUSTRY_MASK))
+            if table is None:
+                return None
+        if table is None:
+            return self.decoder
+        return table.select(data)
+
+    def decoders(self):
+        """Returns every decoder of the PGN, of all manufacturers and variants."""
+        if self.manufacturers is not None:
+            return [decoder for table in self.manufacturers.values() for decoder in table.decoders()]
+        if self.variants is not None:
+            return self.variants.decoders()
+        return [self.decoder]
+
+
+def group_variants(decoders):
+    """
+    Returns the match tables of PGNs with variants as pgn -> (manufacturers, variants).
+
+    Proprietary variants matching on the manufacturer get a dict of (manufacturer code,
+    industry code) -> VariantTable, other PGNs a single VariantTable. PGNs with a single
+    definition that matches on nothing are left out.
+    """
+    definitions = Counter(decoder.pgn for decoder in decoders)
+    tables = {}
+    for decoder in decoders:
+        fields = dict(decoder.match)
+        if not fields and definitions[decoder.pgn] == 1:
+            continue
+
+        manufacturers, variants = tables.setdefault(decoder.pgn, ({}, VariantTable()))
+        if MANUFACTURER_FIELD in fields:
+            key = (fields.pop(MANUFACTURER_FIELD)[2], fields.pop(INDUSTRY_FIELD)[2])
+            manufacturers.setdefault(key, VariantTable()).add(list(fields.values()), decoder)
+        else:
+            variants.add(list(fields.values()), decoder)
+
+    return {
+        pgn: (MappingProxyType(manufacturers) if manufacturers else None, None if manufacturers else variants)
+        for pgn, (manufacturers, variants) in tables.items()
+    }
+
+
+def build_entries(decoders, frame_types):
+    """Returns pgn -> PgnEntry for the decoders of the PGNs in frame_types."""
+    tables = group_variants(decoders)
+    single = {decoder.pgn: decoder for decoder in decoders if decoder.pgn not in tables}
+    min_sizes = {}
+    for decoder in decoders:
+        min_sizes[decoder.pgn] = min(decoder.size, min_sizes.get(decoder.pgn, decoder.size))
+    entries = {}
+    for pgn in {decoder.pgn for decoder in decoders}:
+        frame_type = frame_types.get(pgn)
+        if frame_type is None:
+            _LOGGER.debug("No frame type found for PGN: %d", pgn)
+            continue
+        manufacturers, variants = tables.get(pgn, (None, None))
+        entries[pgn] = PgnEntry(
+            pgn, frame_type, single.get(pgn), is_proprietary_pgn(pgn), manufacturers, variants, min_sizes[pgn]
+        )
+    return entries
+
+
+def load_frame_types(path=PGN_TYPE_PATH):
+    """
+    Returns pgn -> frame type from pgn_type.json. An unreadable file is logged and gives no
+    PGNs.
+    """
+    try:
+        with open(path, "r") as file:
+            smart_data = json.load(file)
+    except Exception as e:
+        _LOGGER.error(f"Error loading {path}: {e}")
+        return MappingProxyType({})
+
+    return MappingProxyType(dict(smart_data["PGNs"]))
+
+
+class DecoderIndex:
+    """
+    PGN to PgnEntry, with the decoders loaded the first time a PGN of their group is
+    looked up.
+
+    A bus carries a few dozen of the PGNs there are decoders for, so most groups are never
+    loaded. PGNs without a frame type are not known and never trigger a load, and a group is
+    loaded once even if it turns out to have no decoder for the PGN. Loading is locked as
+    several integration instances may decode in their own thread.
+
+    Decoding on the event loop must not read files, so there the groups a batch of packets
+    needs are found with missing_groups and loaded in the executor before it is decoded.
+    That includes the PGNs announced for ISO transport, which are loaded with the
+    announcement, before the message is complete.
+    """
+
+    def __init__(self, frame_types, directory=PGN_FIELDS_DIR):
+        self.frame_types = frame_types
+        self.directory = directory
+        self.groups = frozenset(group_of(pgn) for pgn in frame_types)
+        self.entries = {}
+        self.loaded_groups = set()
+        self.load_time = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, pgn, default=None):
+        entry = self.entries.get(pgn)
+        if entry is not None:
+            return entry
+        if pgn not in self.frame_types or group_of(pgn) in self.loaded_groups:
+            return default
+        self.load_group(group_of(pgn))
+        return self.entries.get(pgn, default)
+
+    def __getitem__(self, pgn):
+        entry = self.get(pgn)
+        if entry is None:
+            raise KeyError(pgn)
+        return entry
+
+    def __contains__(self, pgn):
+        return self.get(pgn) is not None
+
+    def load_group(self, group):
+        """Loads the decoders of a group of PGNs, unless that happened already."""
+        with self._lock:
+            if group in self.loaded_groups:
+                return
+
+            start = time.perf_counter()
+            decoders = load_decoders(group_path(group, self.directory))
+            self.entries.update(build_entries(decoders, self.frame_types))
+            self.loaded_groups.add(group)
+            elapsed = time.perf_counter() - start
+            self.load_time += elapsed
+            _LOGGER.debug("Loaded %d decoders of PGN group %d in %.1f ms", len(decoders), group, elapsed * 1000)
+
+    def load_groups(self, groups):
+        """Loads the decoders of several groups of PGNs, runs in the executor on the event loop."""
+        for group in sorted(groups):
+            self.load_group(group)
+
+    def load_pgns(self, pgns):
+        """Loads the decoders of the groups of the known PGNs among pgns."""
+        self.load_groups({group_of(pgn) for pgn in pgns if pgn in self.frame_types})
+
+    def load_all(self):
+        """Loads the decoders of every known PGN."""
+        self.load_groups(self.groups)
+
+    def missing_groups(self, packets):
+        """Returns the groups of known PGNs the extended packets of a batch need that are not loaded."""
+        groups = set()
+        for packet in packets:
+            if len(packet) <= 6 or not packet[1] & TYPE_EXTENDED_FLAG:
+                continue
+            group = (packet[4] << 8 | packet[5] << 16) & PACKET_GROUP_MASK
+            groups.add(group)
+            if group == TP_CM_GROUP and len(packet) > 14 and packet[6] in TP_CM_ANNOUNCES:
+                groups.add(group_of(int.from_bytes(packet[11:14], "little")))
+        groups &= self.groups
+        groups -= self.loaded_groups
+        return groups
+
+    def stats(self):
+        """Returns the loading counters."""
+        return {
+            "decoder_groups_loaded": len(self.loaded_groups),
+            "decoders_loaded": len(self.entries),
+            "decoder_load_ms": round(self.load_time * 1000, 1),
+        }
+
+
+# PGN to PgnEntry, filled as PGNs are seen on the bus
+PGN_INDEX = DecoderIndex(load_frame_types())
+
+
+def fast_pgns():
+    """Returns the PGNs sent as fast packets."""
+    return [pgn for pgn, frame_type in PGN_INDEX.frame_types.items() if frame_type == FRAME_FAST]
@@ -0,0 +1,214 @@
+"""
+Copyright (c) 2024 Smart Boat Innovations
+
+Version 1.0, 01 June 2024
+
+This file is part of the Smart Boat Innovations software.
+
+Smart Boat Innovations ("Licensor") grants you a limited, non-exclusive, non-transferable, revocable license to load and use this software through Home Assistant Community Store (HACS) for personal, non-commercial use only.
+
+You may not copy, distribute, or modify this file or the accompanying software. The software is provided "as is", without warranty of any kind, express or implied, including but not limited to the warranties of merchantability, fitness for a particular purpose and noninfringement. In no event shall the authors or copyright holders be liable for any claim, damages or other liability, whether in an action of contract, tort or otherwise, arising from, out of or in connection with the software or the use or other dealings in the software.
+
+See the full license text in the accompanying LICENSE file.
+"""
+
+# Standard Library Imports
+from collections import OrderedDict
+import logging
+import threading
+import time
+
+# Frame 0 carries the counter byte, the length byte and 6 payload bytes, later frames the
+# counter byte and 7 payload bytes
+FIRST_FRAME_PAYLOAD = 6
+FRAME_PAYLOAD = 7
+MAX_FRAMES = 32  # The frame counter has 5 bits
+
+SESSION_TIMEOUT = 0.75  # Seconds allowed between the frames of a message by NMEA 2000
+DEFAULT_MAX_SESSIONS = 512  # Messages reassembled at the same time
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def split_counter(counter_byte):
+    """Returns (sequence counter, frame counter) of the first data byte of a fast packet frame."""
+    return (counter_byte >> 5) & 0b111, counter_byte & 0b11111
+
+
+class FastPacketSession:
+    """
+    One fast packet message being reassembled from the frames of a single source.
+
+    The frames of a skipped message are tracked without keeping their payload (None).
+    """
+
+    __slots__ = ("sequence", "length", "payload", "pending", "updated")
+
+    def __init__(self, sequence, length, now, skipped=False):
+        self.sequence = sequence
+        self.length = length
+        self.updated = now
+        self.payload = None if skipped else bytearray(length)
+
+        # Bit n is set while frame n is still missing
+        frame_count = 1 + max(0, -(-(length - FIRST_FRAME_PAYLOAD) // FRAME_PAYLOAD))
+        self.pending = (1 << frame_count) - 1
+
+    def add(self, frame_counter, data):
+        """
+        Copies the payload of a frame to its offset, returns False if it does not belong.
+
+        Only the declared length is kept, the 0xFF padding of the last frame is dropped.
+        """
+        bit = 1 << frame_counter
+        if not self.pending & bit:
+            # Beyond the declared length, or already received
+            return False
+
+        if self.payload is None:
+            self.pending &= ~bit
+            return True
+
+        if frame_counter == 0:
+            offset = 0
+            chunk = data[2:2 + FIRST_FRAME_PAYLOAD]
+        else:
+            offset = FIRST_FRAME_PAYLOAD + (frame_counter - 1) * FRAME_PAYLOAD
+            chunk = data[1:1 + FRAME_PAYLOAD]
+
+        end = min(offset + len(chunk), self.length)
+        self.payload[offset:end] = chunk[:end - offset]
+        self.pending &= ~bit
+        return True
+
+    @property
+    def skipped(self):
+        return self.payload is None
+
+    @property
+    def complete(self):
+        return not self.pending
+
+    def missing_frames(self):
+        """Returns the frame counters still missing."""
+        return [frame_counter for frame_counter in range(MAX_FRAMES) if self.pending >> frame_counter & 1]
+
+    def __repr__(self):
+        return f"FastPacketSession(sequence={self.sequence}, length={self.length}, missing={self.missing_frames()})"
+
+
+class FastPacketAssembler:
+    """
+    Reassembles fast packet messages, with one session per (PGN, source address).
+
+    add_frame returns the complete payload once the last missing frame of a message
+    arrives. Frames of a sequence other than the one in progress, frames arriving before
+    frame 0 and duplicates are ignored and counted. A message the caller skips on its
+    frame 0 (e.g. throttled) is counted once, its other frames are taken without copying
+    their payload or counting them as ignored.
+
+    A session expires when no frame arrived for timeout seconds. Sessions are kept in least
+    recently updated order, so expired ones are found at the front without a full scan.
+    At most max_sessions messages are reassembled at once; beyond that the least recently
+    updated session is evicted.
+
+    add_frame runs on the decoder thread in thread mode while snapshot is called from the
+    event loop, so both hold the assembler lock.
+    """
+
+    def __init__(self, timeout=SESSION_TIMEOUT, max_sessions=DEFAULT_MAX_SESSIONS):
+        self.sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self.timeout = timeout
+        self.max_sessions = max_sessions
+
+        self.completed = 0
+        self.skipped = 0
+        self.ignored = 0
+        self.timed_out = 0
+        self.evicted = 0
+
+    def add_frame(self, pgn, source, data, skip=False):
+        """
+        Adds one frame, returns the payload bytes if it completed a message, else None.
+
+        skip only applies to frame 0 and skips the whole message it starts.
+        """
+        with self._lock:
+            return self._add_frame(pgn, source, data, skip)
+
+    def _add_frame(self, pgn, source, data, skip):
+        sequence, frame_counter = split_counter(data[0])
+        key = (pgn, source)
+        sessions = self.sessions
+        now = time.monotonic()
+
+        # Drop sessions that stalled, the oldest are at the front
+        while sessions:
+            oldest = next(iter(sessions.values()))
+            if now - oldest.updated <= self.timeout:
+                break
+            sessions.popitem(last=False)
+            if not oldest.skipped:
+                self.timed_out += 1
+
+        if frame_counter == 0:
+            # A frame 0 always starts a new message, replacing an unfinished one
+            if key in sessions:
+                del sessions[key]
+            elif len(sessions) >= self.max_sessions:
+                sessions.popitem(last=False)
+                self.evicted += 1
+            session = FastPacketSession(sequence, data[1], now, skip)
+            sessions[key] = session
+            if skip:
+                self.skipped += 1
+        else:
+            session = sessions.get(key)
+            if session is None or session.sequence != sequence:
+                _LOGGER.debug("Ignoring frame %d of sequence %d for PGN %d from source %d", frame_counter, sequence, pgn, source)
+                self.ignored += 1
+                return None
+
+        if not session.add(frame_counter, data):
+            _LOGGER.debug("Ignoring duplicate or surplus frame %d for PGN %d from source %d", frame_counter, pgn, source)
+            self.ignored += 1
+            return None
+
+        if not session.complete:
+            session.updated = now
+            sessions.move_to_end(key)
+            return None
+
+        del sessions[key]
+        if session.skipped:
+            return None
+        self.completed += 1
+        return session.payload
+
+    def snapshot(self):
+        """Returns the messages in progress, least recently updated first, for diagnostics."""
+        with self._lock:
+            now = time.monotonic()
+            return [
+                {
+                    "pgn": pgn,
+                    "source": source,
+                    "sequence": session.sequence,
+                    "length": session.length,
+                    "missing_frames": session.missing_frames(),
+                    "age_ms": round((now - session.updated) * 1000),
+                }
+                for (pgn, source), session in self.sessions.items()
+            ]
+
+    def stats(self):
+        """Returns the assembler counters."""
+        return {
+            "fast_packet_sessions": len(self.sessions),
+            "fast_packet_completed": self.completed,
+            "fast_packet_skipped": self.skipped,
+            "fast_packet_ignored": self.ignored,
+            "fast_packet_timed_out": self.timed_out,
+            "fast_packet_evicted": self.evicted,
+        }
@@ -0,0 +1,204 @@
+"""
+Copyright (c) 2024 Smart Boat Innovations
+
+Version 1.0, 01 June 2024
+
+This file is part of the Smart Boat Innovations software.
+
+Smart Boat Innovations ("Licensor") grants you a limited, non-exclusive, non-transferable, revocable license to load and use this software through Home Assistant Community Store (HACS) for personal, non-commercial use only.
+
+You may not copy, distribute, or modify this file or the accompanying software. The software is provided "as is", without warranty of any kind, express or implied, including but not limited to the warranties of merchantability, fitness for a particular purpose and noninfringement. In no event shall the authors or copyright holders be liable for any claim, damages or other liability, whether in an action of contract, tort or otherwise, arising from, out of or in connection with the software or the use or other dealings in the software.
+
+See the full license text in the accompanying LICENSE file.
+"""
+
+# Standard Library Imports
+import logging
+
+FRAME_START = 0xAA
+FRAME_END = 0x55
+
+# Type byte layout: 0b11 header marker, extended frame flag, remote frame flag, data length
+TYPE_MARKER_MASK = 0xC0
+TYPE_EXTENDED_FLAG = 0x20
+TYPE_LENGTH_MASK = 0x0F
+
+EXTENDED_ID_LENGTH = 4
+STANDARD_ID_LENGTH = 2
+MAX_DATA_LENGTH = 8
+
+# Start byte, type byte and end byte surrounding the frame ID and data
+FRAME_OVERHEAD = 3
+
+DEFAULT_CAPACITY = 4096
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def frame_length(type_byte):
+    """
+    Returns the total length of a frame, start and end byte included, for the given type
+    byte, or None if the type byte cannot be valid.
+    """
+    if type_byte & TYPE_MARKER_MASK != TYPE_MARKER_MASK:
+        return None
+
+    data_length = type_byte & TYPE_LENGTH_MASK
+    if data_length > MAX_DATA_LENGTH:
+        return None
+
+    id_length = EXTENDED_ID_LENGTH if type_byte & TYPE_EXTENDED_FLAG else STANDARD_ID_LENGTH
+    return FRAME_OVERHEAD + id_length + data_length
+
+
+# Frame length for every possible type byte, None where the type byte is invalid
+FRAME_LENGTHS = tuple(frame_length(type_byte) for type_byte in range(256))
+
+
+class Smart2000Framer:
+    """
+    Splits the Smart2000 USB byte stream into 0xAA ... 0x55 frames.
+
+    The frame end is derived from the data length carried in the type byte, so payload bytes
+    equal to 0x55 do not end a frame early. When the terminator is not where the header says
+    it should be, the framer resynchronises on the next 0xAA and counts the event.
+
+    Incoming data is copied once into a preallocated buffer. Frames are handed out as
+    memoryview slices of that buffer, so no per-frame copies are made. The unconsumed
+    tail is only moved to the front of the buffer when there is no room left behind it.
+    """
+
+    __slots__ = (
+        "_buffer",
+        "_view",
+        "_capacity",
+        "_head",
+        "_tail",
+        "frames",
+        "resyncs",
+        "discarded_bytes",
+        "compactions",
+        "overflows",
+    )
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self._buffer = bytearray(capacity)
+        self._view = memoryview(self._buffer)
+        self._capacity = capacity
+        self._head = 0  # First byte that has not been consumed yet
+        self._tail = 0  # End of the valid data in the buffer
+        self.frames = 0
+        self.resyncs = 0
+        self.discarded_bytes = 0
+        self.compactions = 0
+        self.overflows = 0
+
+    def feed(self, data):
+        """
+        Appends data to the buffer and yields every complete frame as a memoryview.
+
+        The views point into the internal buffer. They are only valid until the
+        generator is resumed, so callers must consume (or copy) each frame straight away.
+        """
+        buffer = self._buffer
+        find = buffer.find
+        view = self._view
+        lengths = FRAME_LENGTHS
+        offset = 0
+        length = len(data)
+
+        while offset < length:
+            tail = self._tail
+            free = self._capacity - tail
+            if free < length - offset:
+                self._compact()
+                tail = self._tail
+                free = self._capacity - tail
+
+                if free == 0:
+                    # The buffer cannot hold a frame this large, so its contents are noise
+                    _LOGGER.debug("Frame buffer overflow, discarding %d bytes", tail - self._head)
+                    self.overflows += 1
+                    self.discarded_bytes += tail - self._head
+                    self._head = tail = 0
+                    free = self._capacity
+
+            if offset == 0 and free >= length:
+                view[tail:tail + length] = data
+                offset = length
+                tail += length
+            else:
+                chunk = min(free, length - offset)
+                view[tail:tail + chunk] = memoryview(data)[offset:offset + chunk]
+                offset += chunk
+                tail += chunk
+            self._tail = tail
+
+            head = self._head
+            while head < tail:
+                if buffer[head] != FRAME_START:
+                    # Skip noise up to the next candidate start byte
+                    start = find(FRAME_START, head + 1, tail)
+                    if start == -1:
+                        self.discarded_bytes += tail - head
+                        head = tail
+                        break
+                    self.discarded_bytes += start - head
+                    head = start
+
+                if head + 1 == tail:
+                    break  # Type byte not received yet
+
+                size = lengths[buffer[head + 1]]
+                if size is None:
+                    self._resync(head)
+                    head += 1
+                    continue
+
+                end = head + size
+                if end > tail:
+                    break  # Frame not complete yet
+
+                if buffer[end - 1] != FRAME_END:
+                    self._resync(head)
+                    head += 1
+                    continue
+
+                start = head
+                head = self._head = end
+                self.frames += 1
+                yield view[start:end]
+
+            if head == tail:
+                # Everything has been consumed, restart at the front without copying
+                head = self._tail = 0
+
+            self._head = head
+
+    def _resync(self, position):
+        """Counts a corrupt frame header at position, scanning resumes after its start byte."""
+        self.resyncs += 1
+        self.discarded_bytes += 1
+        _LOGGER.debug("Corrupt frame at buffer offset %d, resynchronising", position)
+
+    def _compact(self):
+        """Moves the unconsumed bytes to the front of the buffer."""
+        pending = self._tail - self._head
+        if self._head == 0:
+            return
+
+        self._buffer[0:pending] = self._buffer[self._head:self._tail]
+        self._head = 0
+        self._tail = pending
+        self.compactions += 1
+
+    def stats(self):
+        """Returns the framer counters."""
+        return {
+            "frames": self.frames,
+            "resyncs": self.resyncs,
+            "discarded_bytes": self.discarded_bytes,
+            "compactions": self.compactions,
+            "overflows": self.overflows,
+            "buffered_bytes": self._tail - self._head,
+        }
@@ -0,0 +1,173 @@
+"""
+Copyright (c) 2024 Smart Boat Innovations
+
+Version 1.0, 01 June 2024
+
+This file is part of the Smart Boat Innovations software.
+
+Smart Boat Innovations ("Licensor") grants you a limited, non-exclusive, non-transferable, revocable license to load and use this software through Home Assistant Community Store (HACS) for personal, non-commercial use only.
+
+You may not copy, distribute, or modify this file or the accompanying software. The software is provided "as is", without warranty of any kind, express or implied, including but not limited to the warranties of merchantability, fitness for a particular purpose and noninfringement. In no event shall the authors or copyright holders be liable for any claim, damages or other liability, whether in an action of contract, tort or otherwise, arising from, out of or in connection with the software or the use or other dealings in the software.
+
+See the full license text in the accompanying LICENSE file.
+"""
+
+# Standard Library Imports
+from collections import OrderedDict
+import logging
+import time
+
+from .can_frame import BROADCAST_ADDRESS
+
+PGN_TP_CM = 60416  # ISO Transport Protocol, Connection Management
+PGN_TP_DT = 60160  # ISO Transport Protocol, Data Transfer
+TRANSPORT_PGNS = frozenset([PGN_TP_CM, PGN_TP_DT])
+
+# Control bytes of TP.CM
+TP_CM_RTS = 16  # Request to send
+TP_CM_CTS = 17  # Clear to send
+TP_CM_EOM = 19  # End of message acknowledgment
+TP_CM_BAM = 32  # Broadcast announce message
+TP_CM_ABORT = 255  # Connection abort
+
+TP_DT_PAYLOAD = 7  # Data bytes per TP.DT frame
+SESSION_TIMEOUT = 0.75  # Seconds allowed between the frames of a transfer (J1939-21 T1)
+DEFAULT_MAX_SESSIONS = 64  # Transfers reassembled at the same time
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class TransportSession:
+    """One message being reassembled from the TP.DT frames of a BAM or RTS/CTS transfer."""
+
+    __slots__ = ("pgn", "size", "packets", "payload", "received", "updated")
+
+    def __init__(self, pgn, size, packets, now):
+        self.pgn = pgn
+        self.size = size
+        self.packets = packets
+        self.payload = bytearray(packets * TP_DT_PAYLOAD)
+        self.received = 0
+        self.updated = now
+
+
+class TransportAssembler:
+    """
+    Reassembles ISO Transport Protocol (TP.CM/TP.DT) transfers.
+
+    A BAM or RTS announces the PGN, size and packet count of a transfer. The TP.DT frames
+    that follow do not repeat the PGN, so a transfer is identified by its source and
+    destination address and each pair carries one PGN at a time. Data packets are copied
+    to their offset in a preallocated buffer, and the rebuilt message is returned as
+    (pgn, payload) once the last packet arrived. CTS and EOM only steer the sender and are
+    not needed to follow a transfer. An abort from either side ends it.
+
+    Transfers expire when no packet arrived for timeout seconds, and at most max_sessions
+    run at once before the least recently updated one is evicted.
+    """
+
+    def __init__(self, timeout=SESSION_TIMEOUT, max_sessions=DEFAULT_MAX_SESSIONS):
+        self.sessions = OrderedDict()
+        self.timeout = timeout
+        self.max_sessions = max_sessions
+
+        self.completed = 0
+        self.aborted = 0
+        self.ignored = 0
+        self.timed_out = 0
+        self.evicted = 0
+
+    def add_frame(self, frame):
+        """Adds a TP.CM or TP.DT frame, returns (pgn, payload) when it completed a message."""
+        sessions = self.sessions
+        now = time.monotonic()
+
+        # Drop transfers that stalled, the oldest are at the front
+        while sessions:
+            oldest = next(iter(sessions.values()))
+            if now - oldest.updated <= self.timeout:
+                break
+            sessions.popitem(last=False)
+            self.timed_out += 1
+
+        if frame.pgn == PGN_TP_CM:
+            self._connection_management(frame, now)
+            return None
+        return self._data_transfer(frame, now)
+
+    def _connection_management(self, frame, now):
+        """Starts or aborts a transfer."""
+        data = frame.data
+        if len(data) < 8:
+            self.ignored += 1
+            return
+
+        control = data[0]
+        pgn = int.from_bytes(data[5:8], byteorder='little')
+        key = (frame.source, frame.destination)
+
+        if control == TP_CM_BAM or (control == TP_CM_RTS and frame.destination != BROADCAST_ADDRESS):
+            size = int.from_bytes(data[1:3], byteorder='little')
+            packets = data[3]
+            if not packets or size > packets * TP_DT_PAYLOAD:
+                _LOGGER.debug("Ignoring transfer of PGN %d with %d bytes in %d packets from source %d", pgn, size, packets, frame.source)
+                self.ignored += 1
+                return
+
+            # A new announcement replaces an unfinished transfer between the same addresses
+            if key in self.sessions:
+                del self.sessions[key]
+            elif len(self.sessions) >= self.max_sessions:
+                self.sessions.popitem(last=False)
+                self.evicted += 1
+            self.sessions[key] = TransportSession(pgn, size, packets, now)
+            _LOGGER.debug("Transfer of PGN %d with %d bytes from source %d to %d started", pgn, size, frame.source, frame.destination)
+
+        elif control == TP_CM_ABORT:
+            # Either side may abort, the receiver sends it with the addresses swapped
+            for session_key in (key, (frame.destination, frame.source)):
+                session = self.sessions.get(session_key)
+                if session is not None and session.pgn == pgn:
+                    del self.sessions[session_key]
+                    self.aborted += 1
+
+    def _data_transfer(self, frame, now):
+        """Stores a data packet, returns (pgn, payload) once the transfer is complete."""
+        data = frame.data
+        key = (frame.source, frame.destination)
+        session = self.sessions.get(key)
+        sequence = data[0] if data else 0
+
+        if session is None or not 1 <= sequence <= session.packets:
+            self.ignored += 1
+            return None
+
+        bit = 1 << (sequence - 1)
+        if session.received & bit:
+            self.ignored += 1
+            return None
+
+        offset = (sequence - 1) * TP_DT_PAYLOAD
+        chunk = data[1:1 + TP_DT_PAYLOAD]
+        session.payload[offset:offset + len(chunk)] = chunk
+        session.received |= bit
+
+        if session.received != (1 << session.packets) - 1:
+            session.updated = now
+            self.sessions.move_to_end(key)
+            return None
+
+        del self.sessions[key]
+        self.completed += 1
+        return session.pgn, session.payload[:session.size]
+
+    def stats(self):
+        """Returns the assembler counters."""
+        return {
+            "transport_sessions": len(self.sessions),
+            "transport_completed": self.completed,
+            "transport_aborted": self.aborted,
+            "transport_ignored": self.ignored,
+            "transport_timed_out": self.timed_out,
+            "transport_evicted": self.evicted,
+        }
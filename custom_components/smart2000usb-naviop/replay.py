@@ -0,0 +1,175 @@
+"""
+Copyright (c) 2024 Smart Boat Innovations
+
+Version 1.0, 01 June 2024
+
+This file is part of the Smart Boat Innovations software.
+
+Smart Boat Innovations ("Licensor") grants you a limited, non-exclusive, non-transferable, revocable license to load and use this software through Home Assistant Community Store (HACS) for personal, non-commercial use only.
+
+You may not copy, distribute, or modify this file or the accompanying software. The software is provided "as is", without warranty of any kind, express or implied, including but not limited to the warranties of merchantability, fitness for a particular purpose and noninfringement. In no event shall the authors or copyright holders be liable for any claim, damages or other liability, whether in an action of contract, tort or otherwise, arising from, out of or in connection with the software or the use or other dealings in the software.
+
+See the full license text in the accompanying LICENSE file.
+"""
+
+# Standard Library Imports
+import asyncio
+import logging
+import os
+import time
+
+from .capture import CAPTURE_EXTENSION, CAPTURE_STANDARD_FLAG, COMPRESSED_EXTENSION, STANDARD_ID_MASK, iter_capture
+from .framer import (
+    EXTENDED_ID_LENGTH,
+    FRAME_END,
+    FRAME_START,
+    STANDARD_ID_LENGTH,
+    TYPE_EXTENDED_FLAG,
+    TYPE_MARKER_MASK,
+)
+
+REPLAY_MAX_SPEED = 0  # Speed factor for replaying as fast as the pipeline can take it
+DEFAULT_REPLAY_SPEED = 1.0
+REPLAY_BLOCK_SIZE = 512  # Records read from the capture file at a time
+MAX_SPEED_HIGH_WATER = 0.5  # Fraction of the frame queue that may fill up at maximum speed
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def encode_frame(can_id, payload):
+    """Encodes a captured frame again the way the Smart2000 USB device sends it."""
+    if can_id & CAPTURE_STANDARD_FLAG:
+        header = bytes((FRAME_START, TYPE_MARKER_MASK | len(payload)))
+        frame_id = (can_id & STANDARD_ID_MASK).to_bytes(STANDARD_ID_LENGTH, byteorder='little')
+    else:
+        header = bytes((FRAME_START, TYPE_MARKER_MASK | TYPE_EXTENDED_FLAG | len(payload)))
+        frame_id = can_id.to_bytes(EXTENDED_ID_LENGTH, byteorder='little')
+    return b"".join((header, frame_id, payload, bytes((FRAME_END,))))
+
+
+def capture_files(path):
+    """Returns the capture files at path, a single file or a directory of rotated files."""
+    if not os.path.isdir(path):
+        return [path]
+
+    return sorted(
+        os.path.join(path, file_name)
+        for file_name in os.listdir(path)
+        if file_name.endswith(CAPTURE_EXTENSION) or file_name.endswith(CAPTURE_EXTENSION + COMPRESSED_EXTENSION)
+    )
+
+
+def _read_block(records):
+    """Reads the next block of records, runs in the executor to keep file I/O off the loop."""
+    block = []
+    for record in records:
+        block.append(record)
+        if len(block) >= REPLAY_BLOCK_SIZE:
+            break
+    return block
+
+
+class CaptureReplay:
+    """
+    Replays capture files in place of the serial port.
+
+    Every recorded frame is encoded again and fed through the framer, so the replayed
+    traffic goes through exactly the same path as live traffic: framing, the frame queue,
+    process_packet, fast packet reassembly and publish_field.
+
+    speed 1 replays in real time, speed N N times faster and REPLAY_MAX_SPEED as fast as
+    possible. At maximum speed the replay waits whenever the frame queue is more than half
+    full, so the measured rate is what the pipeline sustains rather than what it sheds.
+    Timing restarts at the first frame of every file, gaps between files are skipped. The
+    replay finishes once the queue is empty, so the rate covers decoding end to end.
+    """
+
+    def __init__(self, path, framer, packet_callback, speed=DEFAULT_REPLAY_SPEED, pending=None, capacity=None):
+        self._path = path
+        self._framer = framer
+        self._packet_callback = packet_callback
+        self._speed = speed
+        self._pending = pending
+        self._high_water = int(capacity * MAX_SPEED_HIGH_WATER) if capacity else None
+
+        self.file = None
+        self.frames = 0
+        self.started = None
+        self.finished = None
+
+    async def run(self):
+        """Replays all capture files once, returns the number of frames replayed."""
+        loop = asyncio.get_running_loop()
+        self.started = time.monotonic()
+
+        for path in capture_files(self._path):
+            self.file = path
+            _LOGGER.info("Replaying %s at %s", path, f"{self._speed}x" if self._speed else "maximum speed")
+            records = iter_capture(path)
+            first_timestamp = None
+            first_time = None
+
+            while True:
+                block = await loop.run_in_executor(None, _read_block, records)
+                if not block:
+                    break
+
+                if first_timestamp is None:
+                    first_timestamp = block[0][0]
+                    first_time = time.monotonic()
+
+                if self._speed:
+                    await self._replay_paced(block, first_timestamp, first_time)
+                else:
+                    self._feed(block)
+                    await self._wait_for_room()
+
+        # The replay is only done once the decoder has worked through the queue
+        if self._pending is not None:
+            while self._pending():
+                await asyncio.sleep(0.001)
+
+        self.finished = time.monotonic()
+        return self.frames
+
+    async def _replay_paced(self, block, first_timestamp, first_time):
+        """Feeds a block of records at the recorded pace, scaled by the speed factor."""
+        speed = self._speed
+        start = 0
+        for index, (timestamp, _can_id, _payload) in enumerate(block):
+            delay = first_time + (timestamp - first_timestamp) / 1e9 / speed - time.monotonic()
+            if delay > 0.001:
+                # Hand over what is due so far, then wait for the next frame
+                self._feed(block[start:index])
+                start = index
+                await asyncio.sleep(delay)
+        self._feed(block[start:])
+
+    def _feed(self, records):
+        """Frames the encoded records and passes every packet on."""
+        if not records:
+            return
+
+        data = b"".join(encode_frame(can_id, payload) for _timestamp, can_id, payload in records)
+        for packet in self._framer.feed(data):
+            self._packet_callback(packet)
+        self.frames += len(records)
+
+    async def _wait_for_room(self):
+        """At maximum speed, let the decoder catch up before queueing more."""
+        if self._pending is None or self._high_water is None:
+            await asyncio.sleep(0)
+            return
+
+        while self._pending() > self._high_water:
+            await asyncio.sleep(0.001)
+
+    def stats(self):
+        """Returns the replay counters and the rate achieved so far."""
+        elapsed = ((self.finished or time.monotonic()) - self.started) if self.started else 0
+        return {
+            "replay_file": self.file,
+            "replay_frames": self.frames,
+            "replay_rate": round(self.frames / elapsed) if elapsed else None,
+            "replay_finished": self.finished is not None,
+        }
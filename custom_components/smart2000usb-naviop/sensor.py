@@ -14,11 +14,9 @@ See the full license text in the accompanying LICENSE file.
 
 # Standard Library Imports
 import asyncio
-import json
+from collections import Counter
 import logging
-import os
 from datetime import  datetime, timedelta
-import pprint
 import serial_asyncio
 from serial import SerialException
 import binascii
@@ -40,13 +38,41 @@ from homeassistant.const import (
     EVENT_HOMEASSISTANT_STOP
 )
 
-from .pgns import *
+from .framer import Smart2000Framer, TYPE_EXTENDED_FLAG
+from .can_frame import CanFrame, decode_can_id
+from .fast_packet import FastPacketAssembler, split_counter
+from .iso_tp import TransportAssembler, TRANSPORT_PGNS
+from .dispatch import PGN_INDEX, FRAME_FAST, FRAME_SINGLE, fast_pgns
+from .decoder import FieldSelection, parse_field_selectors
+from .transport import Smart2000Protocol, read_stream, TRANSPORT_PROTOCOL, TRANSPORT_STREAM
+from .worker import DecoderThread, SerialReaderThread, current_batch, EXECUTION_EVENT_LOOP, EXECUTION_THREAD
+from .backpressure import FrameQueue, DEFAULT_QUEUE_SIZE, HIGH_PRIORITY_PGNS, OVERLOAD_DROP_OLDEST
+from .capture import CaptureRecorder, DEFAULT_MAX_SIZE, DEFAULT_ROTATE_INTERVAL
+from .replay import CaptureReplay, DEFAULT_REPLAY_SPEED
 
 CONF_BAUDRATE = "baudrate"
 CONF_SERIAL_PORT = "serial_port"
+CONF_TRANSPORT = "transport"
+CONF_EXECUTION_MODE = "execution_mode"
+CONF_QUEUE_SIZE = "queue_size"
+CONF_OVERLOAD_POLICY = "overload_policy"
+CONF_CAPTURE_DIR = "capture_dir"
+CONF_CAPTURE_MAX_SIZE = "capture_max_size"
+CONF_CAPTURE_ROTATE_MINUTES = "capture_rotate_minutes"
+CONF_CAPTURE_COMPRESS = "capture_compress"
+CONF_REPLAY_PATH = "replay_path"
+CONF_REPLAY_SPEED = "replay_speed"
+CONF_EXPOSE_RESERVED = "expose_reserved"
+CONF_FIELD_INCLUDE = "field_include"
+CONF_FIELD_EXCLUDE = "field_exclude"
 
 DEFAULT_NAME = "Serial Sensor"
 DEFAULT_BAUDRATE = 2000000
+DEFAULT_TRANSPORT = TRANSPORT_STREAM
+DEFAULT_EXECUTION_MODE = EXECUTION_EVENT_LOOP
+DEFAULT_OVERLOAD_POLICY = OVERLOAD_DROP_OLDEST
+DEFAULT_CAPTURE_MAX_SIZE = DEFAULT_MAX_SIZE // (1024 * 1024)  # Megabytes
+DEFAULT_CAPTURE_ROTATE_MINUTES = DEFAULT_ROTATE_INTERVAL // 60
 DEFAULT_BYTESIZE = serial_asyncio.serial.EIGHTBITS
 DEFAULT_PARITY = serial_asyncio.serial.PARITY_NONE
 DEFAULT_STOPBITS = serial_asyncio.serial.STOPBITS_ONE
@@ -54,6 +80,9 @@ DEFAULT_XONXOFF = False
 DEFAULT_RTSCTS = False
 DEFAULT_DSRDTR = False
 
+DIAGNOSTICS_INTERVAL = 30  # Seconds between updates of the serial sensor attributes
+DECODE_BATCH_SIZE = 64  # Frames decoded on the event loop before yielding to the reader
+
 # Setting up logging and configuring constants and default values
 
 _LOGGER = logging.getLogger(__name__)
@@ -68,6 +97,14 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_e
     
     serial_port = entry.data[CONF_SERIAL_PORT]
     baudrate = entry.data[CONF_BAUDRATE]
+    transport = entry.data.get(CONF_TRANSPORT, DEFAULT_TRANSPORT)
+    execution_mode = entry.data.get(CONF_EXECUTION_MODE, DEFAULT_EXECUTION_MODE)
+    queue_size = entry.data.get(CONF_QUEUE_SIZE, DEFAULT_QUEUE_SIZE)
+    overload_policy = entry.data.get(CONF_OVERLOAD_POLICY, DEFAULT_OVERLOAD_POLICY)
+    capture_dir = entry.data.get(CONF_CAPTURE_DIR, '').strip()
+    replay_path = entry.data.get(CONF_REPLAY_PATH, '').strip()
+    replay_speed = entry.data.get(CONF_REPLAY_SPEED, DEFAULT_REPLAY_SPEED)
+    expose_reserved = entry.data.get(CONF_EXPOSE_RESERVED, False)
        
     bytesize = DEFAULT_BYTESIZE
     parity = DEFAULT_PARITY
@@ -78,28 +115,43 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_e
     
     pgn_include = parse_and_validate_comma_separated_integers(entry.data.get('pgn_include', ''))
     pgn_exclude = parse_and_validate_comma_separated_integers(entry.data.get('pgn_exclude', ''))
+    pgn_high_priority = parse_and_validate_comma_separated_integers(entry.data.get('pgn_high_priority', ''))
+    pgn_low_priority = parse_and_validate_comma_separated_integers(entry.data.get('pgn_low_priority', ''))
+    field_include = parse_field_selectors(entry.data.get(CONF_FIELD_INCLUDE, ''))
+    field_exclude = parse_field_selectors(entry.data.get(CONF_FIELD_EXCLUDE, ''))
     
-    _LOGGER.info(f"Configuring sensor with name: {name}, serial_port: {serial_port}, baudrate: {baudrate}, PGN Include: {pgn_include}, PGN Exclude: {pgn_exclude}")
+    _LOGGER.info(f"Configuring sensor with name: {name}, serial_port: {serial_port}, baudrate: {baudrate}, transport: {transport}, execution mode: {execution_mode}, queue size: {queue_size}, overload policy: {overload_policy}, PGN Include: {pgn_include}, PGN Exclude: {pgn_exclude}, PGN High Priority: {pgn_high_priority}, PGN Low Priority: {pgn_low_priority}, Field Include: {field_include}, Field Exclude: {field_exclude}")
         
     # Initialize unique dictionary keys based on the integration name
     add_entities_key = f"{name}_add_entities"
     created_sensors_key = f"{name}_created_sensors"
-    smart2000usb_data_key = f"{name}_smart2000usb_data"
+    unknown_pgns_key = f"{name}_unknown_pgns_key"
+    unmatched_pgns_key = f"{name}_unmatched_pgns_key"
+    short_frames_key = f"{name}_short_frames_key"
     fast_packet_key = f"{name}_fast_packet_key"
+    transport_key = f"{name}_transport_key"
     whitelist_key = f"{name}_whitelist_key"
     blacklist_key = f"{name}_blacklist_key"
+    field_selection_key = f"{name}_field_selection_key"
     
     hass.data[whitelist_key] = pgn_include
     hass.data[blacklist_key] = pgn_exclude
     
+    # The fields published per PGN, reserved and spare fields carry no information and are
+    # only published for protocol work
+    hass.data[field_selection_key] = FieldSelection(field_include, field_exclude, expose_reserved)
+    
     smart2000timestamp_key = f"{name}_smart2000timestamp_key"
     hass.data[smart2000timestamp_key] = {
         "last_processed": {},  
         "min_interval": timedelta(seconds=5),  
         }
     
-    # Initialize dictionary to hold fast packet frames
-    hass.data[fast_packet_key] = {}
+    # Initialize the assembler of fast packet messages
+    hass.data[fast_packet_key] = FastPacketAssembler()
+    
+    # Initialize the assembler of ISO transport protocol messages
+    hass.data[transport_key] = TransportAssembler()
 
 
      # Save a reference to the add_entities callback
@@ -109,30 +161,46 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_e
     # Initialize a dictionary to store references to the created sensors
     hass.data[created_sensors_key] = {}
     
-    # Load the fast pgn json data 
-    config_dir = hass.config.config_dir
-    json_path = os.path.join(config_dir, 'custom_components', 'smart2000usb-naviop', 'pgn_type.json')
-    try:
-        with open(json_path, "r") as file:
-            smart_data = json.load(file)
-
-        pgn_dict = {}
-        # Iterate over each PGN entry in the list
-        for pgn_entry in smart_data["PGNs"]:
-            pgn_id, pgn_type = pgn_entry  # Unpack the tuple
-    
-            # Store the PGN and its type in the dictionary
-            pgn_dict[pgn_id] = pgn_type
-            
-            
-        hass.data[smart2000usb_data_key] = pgn_dict
-        
-
-    except Exception as e:
-        _LOGGER.error(f"Error loading Smart2000.json: {e}")
+    # Count frames of PGNs without a decoder instead of logging each one
+    hass.data[unknown_pgns_key] = Counter()
+    
+    # Count frames of proprietary PGNs from manufacturers (or of variants) without a decoder
+    hass.data[unmatched_pgns_key] = Counter()
+    
+    # Count frames too short for their PGN, which are dropped rather than decoded
+    hass.data[short_frames_key] = Counter()
+    
+    # The frame types come from pgn_type.json, decoders are loaded as their PGNs are seen
+    if not PGN_INDEX.frame_types:
+        _LOGGER.error("No PGN decoders available, check pgn_type.json")
         return
+    
+    # Load the decoders of the PGNs sure to be decoded up front, without blocking the loop
+    await hass.async_add_executor_job(
+        PGN_INDEX.load_pgns,
+        set(pgn_include) | HIGH_PRIORITY_PGNS | set(pgn_high_priority) | set(field_include) | set(field_exclude),
+    )
+    check_field_selectors(field_include, "Fields to Include")
+    check_field_selectors(field_exclude, "Fields to Exclude")
   
     
+    # Optionally record every raw frame for offline analysis
+    recorder = None
+    if capture_dir:
+        recorder = CaptureRecorder(
+            hass.config.path(capture_dir),
+            name,
+            max_size=entry.data.get(CONF_CAPTURE_MAX_SIZE, DEFAULT_CAPTURE_MAX_SIZE) * 1024 * 1024,
+            rotate_interval=entry.data.get(CONF_CAPTURE_ROTATE_MINUTES, DEFAULT_CAPTURE_ROTATE_MINUTES) * 60,
+            compress=entry.data.get(CONF_CAPTURE_COMPRESS, False),
+        )
+        _LOGGER.info(f"Recording raw frames of {name} to {hass.config.path(capture_dir)}")
+
+    # A capture to replay takes the place of the serial port
+    if replay_path:
+        replay_path = hass.config.path(replay_path)
+        _LOGGER.info(f"Replaying {replay_path} instead of reading {serial_port}")
+
     sensor = SerialSensor(
         name,
         serial_port,
@@ -143,6 +211,16 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_e
         xonxoff,
         rtscts,
         dsrdtr,
+        transport,
+        execution_mode,
+        queue_size,
+        overload_policy,
+        fast_pgns(),
+        pgn_high_priority,
+        pgn_low_priority,
+        recorder,
+        replay_path or None,
+        replay_speed,
     )
     
     hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, sensor.stop_serial_read)
@@ -164,7 +242,7 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     _LOGGER.debug(f"Unload integration with name: {name}")
    
     # Clean up hass.data entries
-    for key_suffix in ['add_entities', 'created_sensors', 'smart2000usb_data', 'fast_packet', 'whitelist', 'blacklist', 'smart2000timestamp']:
+    for key_suffix in ['add_entities', 'created_sensors', 'unknown_pgns', 'unmatched_pgns', 'short_frames', 'fast_packet', 'transport', 'whitelist', 'blacklist', 'field_selection', 'smart2000timestamp']:
         key = f"{name}_{key_suffix}"
         if key in hass.data:
             _LOGGER.debug(f"Removing {key} from hass.data.")
@@ -212,128 +290,81 @@ def parse_and_validate_comma_separated_integers(input_str: str):
     return validated_integers
 
 
+def check_field_selectors(selectors, setting):
+    """
+    Logs the fields of PGN.field selectors that no definition of their PGN has, e.g. a
+    misspelled name that would leave an included PGN without any published field.
+    """
+    for pgn, names in selectors.items():
+        entry = PGN_INDEX.get(pgn)
+        if entry is None:
+            _LOGGER.warning(f"{setting}: no decoder found for PGN {pgn}, its field selectors have no effect.")
+            continue
+        known = {field.name for decoder in entry.decoders() for field in decoder.fields}
+        unknown = sorted(names - known)
+        if unknown:
+            _LOGGER.warning(f"{setting}: PGN {pgn} has no field named {', '.join(unknown)}, known fields: {', '.join(sorted(known))}.")
+
+
 def call_process_function(pgn, hass, instance_name, data_frames):
-    function_name = f'process_pgn_{pgn}'
-    function_to_call = globals().get(function_name)
+    entry = PGN_INDEX.get(pgn)
 
     # Check if the function exists
-    if function_to_call:
-        function_to_call(hass, instance_name, data_frames)
+    if entry:
+        decode_payload(entry, hass, instance_name, data_frames)
     else:
-        _LOGGER.debug(f"No function found for PGN: {pgn}")
+        hass.data[f"{instance_name}_unknown_pgns_key"][pgn] += 1
 
 
-def combine_pgn_frames(hass, pgn, instance_name):
-    """Combine stored frame data for a PGN into a single hex string, preserving the original byte lengths."""
-    
-    fast_packet_key = f"{instance_name}_fast_packet_key"
+def decode_payload(entry, hass, instance_name, data):
+    """Decodes the payload bytes with the variant of its PGN that matches the manufacturer and match fields."""
+    decoder = entry.select_decoder(data)
+    if decoder is None:
+        hass.data[f"{instance_name}_unmatched_pgns_key"][entry.pgn] += 1
+        return
     
-    if pgn not in hass.data[fast_packet_key]:
-        _LOGGER.debug(f"No fast packet data available for PGN {pgn}")
-        return None
-
-    pgn_data = hass.data[fast_packet_key][pgn]
-    combined_payload_hex = ""  # Start with an empty string
-
-    for frame_counter in sorted(pgn_data['frames']):
-        frame_data_hex = pgn_data['frames'][frame_counter]
-        combined_payload_hex = frame_data_hex + combined_payload_hex
-
-
-    return combined_payload_hex
+    decoder(hass, instance_name, data, hass.data[f"{instance_name}_field_selection_key"].layout(decoder))
 
 
-
-def process_fast_packet(pgn, hass, instance_name, data64, data64_hex):
+def process_fast_packet(hass, instance_name, frame):
     
     fast_packet_key = f"{instance_name}_fast_packet_key"
+    pgn = frame.pgn
+    data = frame.data
     
-    # Check if this PGN already has a storage structure; if not, create one
-    if pgn not in hass.data[fast_packet_key]:
-        hass.data[fast_packet_key][pgn] = {'frames': {}, 'payload_length': 0, 'bytes_stored': 0}
-        
-    pgn_data = hass.data[fast_packet_key][pgn]
-               
-    # Convert the last two characters to an integer to get the sequence and frame counters
-    last_byte = int(data64_hex[-2:], 16)  # Convert the last two hex digits to an integer
-    
-    # Extract the sequence counter (high 3 bits) and frame counter (low 5 bits) from the last byte
-    sequence_counter = (last_byte >> 5) & 0b111  # Extract high 3 bits
-    frame_counter = last_byte & 0b11111  # Extract low 5 bits
+    # Every frame starts with the counters, the first frame also holds the message length
+    if not data:
+        hass.data[f"{instance_name}_short_frames_key"][pgn] += 1
+        return
     
-    total_bytes = None
+    # The first data byte holds the sequence counter (high 3 bits) and frame counter (low 5 bits)
+    sequence_counter, frame_counter = split_counter(data[0])
     
-    if frame_counter == 0 and not can_process(hass, instance_name, pgn):
+    if frame_counter == 0 and len(data) < 2:
+        hass.data[f"{instance_name}_short_frames_key"][pgn] += 1
         return
-
-    if frame_counter != 0 and pgn_data['payload_length'] == 0:
-        _LOGGER.debug(f"Ignoring frame {frame_counter} for PGN {pgn} as first frame has not been received.")
-        return
-       
-    # Calculate data payload
-    if frame_counter == 0:
-        
-        # Extract the total number of frames from the second-to-last byte
-        total_bytes_hex = data64_hex[-4:-2]  # Get the second-to-last byte in hex
-        total_bytes = int(total_bytes_hex, 16)  # Convert hex to int
-        
-        # Start a new pgn hass structure 
-      
-        pgn_data['payload_length'] = total_bytes
-        pgn_data['sequence_counter'] = sequence_counter
-        pgn_data['bytes_stored'] = 0  # Reset bytes stored for a new message
-        pgn_data['frames'].clear()  # Clear previous frames
-                
-        # For the first frame, exclude the last 4 hex characters (2 bytes) from the payload
-        data_payload_hex = data64_hex[:-4]
-        
-    else:       
-        if sequence_counter != pgn_data['sequence_counter']:
-            _LOGGER.debug(f"Ignoring frame {sequence_counter} for PGN {pgn} as it does not match current sequence.")
-            return
-        elif frame_counter in pgn_data['frames']:
-            _LOGGER.debug(f"Frame {frame_counter} for PGN {pgn} is already stored.")
-            return
-        else:
-            # For subsequent frames, exclude the last 2 hex characters (1 byte) from the payload
-            data_payload_hex = data64_hex[:-2]
     
-    byte_length = len(data_payload_hex) // 2
+    # The throttle is checked once per message, the assembler then skips its other frames
+    skip = frame_counter == 0 and not can_process(hass, instance_name, pgn)
 
-    # Store the frame data
-    pgn_data['frames'][frame_counter] = data_payload_hex
-    pgn_data['bytes_stored'] += byte_length  # Update the count of bytes stored
+    # Devices sending the same PGN interleave their frames, so every source gets its own session
+    assembler = hass.data[fast_packet_key]
+    payload = assembler.add_frame(pgn, frame.source, data, skip)
      
-    # Log the extracted values
-    _LOGGER.debug(f"Sequence Counter: {sequence_counter}")
-    _LOGGER.debug(f"Frame Counter: {frame_counter}")
-    
-    if total_bytes is not None:
-        _LOGGER.debug(f"Total Payload Bytes: {total_bytes}")
-
-    _LOGGER.debug(f"Orig Payload (hex): {data64_hex}")
-    _LOGGER.debug(f"Data Payload (hex): {data_payload_hex}")
+    if _LOGGER.isEnabledFor(logging.DEBUG):
+        _LOGGER.debug("Sequence Counter: %d, Frame Counter: %d, Orig Payload (hex): %s", sequence_counter, frame_counter, data.hex())
+        _LOGGER.debug("Fast packet session for PGN %d from source %d: %s", pgn, frame.source, assembler.sessions.get((pgn, frame.source)))
     
-    formatted_data = pprint.pformat(hass.data[fast_packet_key])
-    _LOGGER.debug("HASS PGN Data: %s", formatted_data)
-    
-    # Check if all expected bytes have been stored
-    if pgn_data['bytes_stored'] >= pgn_data['payload_length']:
-        
-        _LOGGER.debug("All Fast packet frames collected for PGN: %d", pgn)
-
-        # All data for this PGN has been received, proceed to publish
-        combined_payload_hex = combine_pgn_frames(hass, pgn, instance_name)
-        combined_payload_int = int(combined_payload_hex, 16)
+    if payload is None:
+        return
         
-        if combined_payload_int is not None:
-            _LOGGER.debug(f"Combined Payload (hex): {combined_payload_hex})")
-            _LOGGER.debug(f"Combined Payload (hex): (hex: {combined_payload_int:x})")
+    _LOGGER.debug("All Fast packet frames collected for PGN %d from source %d", pgn, frame.source)
 
-            call_process_function(pgn, hass, instance_name, combined_payload_int)
+    # All data for this message has been received, proceed to publish
+    if _LOGGER.isEnabledFor(logging.DEBUG):
+        _LOGGER.debug("Combined Payload (hex): %s", payload.hex())
 
-        # Reset the structure for this PGN
-        del hass.data[fast_packet_key][pgn]
+    call_process_function(pgn, hass, instance_name, payload)
 
         
 def can_process(hass, instance_name, pgn_id):
@@ -348,7 +379,7 @@ def can_process(hass, instance_name, pgn_id):
         hass.data[smart2000timestamp_key]["last_processed"][pgn_id] = now  
         return True
     else:
-        _LOGGER.debug(f"Throttling activated for PGN {pgn_id} in instance {instance_name}.")
+        _LOGGER.debug("Throttling activated for PGN %d in instance %s.", pgn_id, instance_name)
         return False
 
 
@@ -373,86 +404,77 @@ def is_pgn_allowed_based_on_lists(pgn, pgn_include_list, pgn_exclude_list):
     return True
 
 
-def set_pgn_entity(hass, instance_name, state_value):
-    """Reconstructs PGN and data64 from the sensor state, handling various edge cases."""
-
-    smart2000usb_data_key = f"{instance_name}_smart2000usb_data"
+def process_transport_frame(hass, instance_name, frame):
+    """Feeds a TP.CM or TP.DT frame to the ISO transport assembler and decodes completed messages."""
+    
+    transport_key = f"{instance_name}_transport_key"
     whitelist_key = f"{instance_name}_whitelist_key"
     blacklist_key = f"{instance_name}_blacklist_key"
     
-    pgn_include_list = hass.data[whitelist_key]
-    pgn_exclude_list = hass.data[blacklist_key]
+    message = hass.data[transport_key].add_frame(frame)
+    if message is None:
+        return
     
-
-    # Check if the state_value is None or does not contain a colon, indicating an invalid or unavailable state
-    if state_value is None or ':' not in state_value:
-        _LOGGER.debug('Invalid or unavailable state  : %s' , state_value)
+    pgn, payload = message
+    _LOGGER.debug("ISO transport message of PGN %d with %d bytes from source %d completed", pgn, len(payload), frame.source)
+    
+    if not is_pgn_allowed_based_on_lists(pgn, hass.data[whitelist_key], hass.data[blacklist_key]):
+        _LOGGER.debug("PGN %d skipped due to white/black lists.", pgn)
         return
 
-    try:
-        # Split the state string into PGN, frame counter, and data payload hexadecimal strings
-        parts = state_value.split(':')
-        if len(parts) < 3:
-            _LOGGER.debug('Invalid state format  : %s' , state_value)
-            return
-    
-        pgn_hex, source_id_hex, data64_hex = parts[0], parts[1], parts[2]
-        
-        
-        # Validate the lengths of the fields
-        if len(pgn_hex) != 6:
-            _LOGGER.debug('Invalid PGN length: %s', state_value)
-            return
+    if not can_process(hass, instance_name, pgn):
+        return
 
-        if len(source_id_hex) != 2:
-            _LOGGER.debug('Invalid source ID length: %s', state_value)
-            return
+    call_process_function(pgn, hass, instance_name, payload)
 
-        if len(data64_hex) != 16:
-            _LOGGER.debug('Invalid data64 length: %s', state_value)
-            return        
-    
-        # Convert the hexadecimal strings back to integer values
-        pgn = int(pgn_hex, 16)
-        
-        if not is_pgn_allowed_based_on_lists(pgn, pgn_include_list, pgn_exclude_list):
-            _LOGGER.debug(f"PGN {pgn} skipped due to white/black lists.")
-            return
 
-        
-        source_id = int(source_id_hex, 16)
-        data64 = int(data64_hex, 16)
+def process_frame(hass, instance_name, frame):
+    """Hands a CAN frame to the fast packet or transport assembler or the decoder of its PGN."""
 
-        _LOGGER.debug('---------------------------------------------------')
-        _LOGGER.debug('Reconstructed PGN  : %d (Hex: %s)', pgn, pgn_hex)
-        _LOGGER.debug('Reconstructed source ID  : %d (Hex: %s)', source_id, source_id_hex)
-        _LOGGER.debug('Reconstructed data64  : %d (Hex: %s)', data64, data64_hex)
+    whitelist_key = f"{instance_name}_whitelist_key"
+    blacklist_key = f"{instance_name}_blacklist_key"
+    
+    pgn_include_list = hass.data[whitelist_key]
+    pgn_exclude_list = hass.data[blacklist_key]
+    
+    pgn = frame.pgn
+    
+    # Transport protocol frames only carry pieces of other PGNs, the lists apply to those
+    if pgn in TRANSPORT_PGNS:
+        process_transport_frame(hass, instance_name, frame)
+        return
+    
+    if not is_pgn_allowed_based_on_lists(pgn, pgn_include_list, pgn_exclude_list):
+        _LOGGER.debug("PGN %d skipped due to white/black lists.", pgn)
+        return
 
+    entry = PGN_INDEX.get(pgn)
     
-        pgn_type = hass.data[smart2000usb_data_key].get(pgn)
+    if entry is None:
+        hass.data[f"{instance_name}_unknown_pgns_key"][pgn] += 1
+    elif entry.frame_type == FRAME_FAST:
+        process_fast_packet(hass, instance_name, frame)
+    elif entry.frame_type == FRAME_SINGLE:
+        # A single frame carries every field of its PGN, a shorter one would publish made up values
+        if len(frame.data) < entry.min_size:
+            hass.data[f"{instance_name}_short_frames_key"][pgn] += 1
+            return
         
-        _LOGGER.debug(f"smart2000usb_data_key: {smart2000usb_data_key}")
+        if not can_process(hass, instance_name, pgn):
+            return
         
-            
-        if pgn_type and pgn_type == 'Fast':
-            _LOGGER.debug(f"PGN {pgn} is of type 'Fast'.")
-            process_fast_packet(pgn, hass, instance_name, data64, data64_hex)
-        elif pgn_type and pgn_type == 'Single':
-            if not can_process(hass, instance_name, pgn):
-                return
-            
-            _LOGGER.debug(f"PGN {pgn} is of type 'Single'.")
-            call_process_function(pgn, hass, instance_name, data64)
-        else:
-            _LOGGER.debug(f"PGN {pgn} is not a known PGN.")
-                
+        decode_payload(entry, hass, instance_name, frame.data)
+    # ISO PGNs only arrive through the transport protocol
 
-    except ValueError as e:
-        _LOGGER.error('Error processing state value  : %s. Error: %s' , state_value, e)
 
+def publish_field(hass, instance_name, field_name, field_description, field_value, pgn_description, unit, pgn_id, raw_value=None):
+    batch = current_batch()
+    if batch is not None:
+        # Decoding runs on the decoder thread, the update is applied later on the event loop
+        batch.append((hass, instance_name, field_name, field_description, field_value, pgn_description, unit, pgn_id, raw_value))
+        return
 
-def publish_field(hass, instance_name, field_name, field_description, field_value, pgn_description, unit, pgn_id):
-    _LOGGER.debug(f"Publishing field for PGN {pgn_id} and field {field_name} with value {field_value}")
+    _LOGGER.debug("Publishing field for PGN %s and field %s with value %s", pgn_id, field_name, field_value)
 
     add_entities_key = f"{instance_name}_add_entities"
     created_sensors_key = f"{instance_name}_created_sensors"
@@ -483,58 +505,38 @@ def publish_field(hass, instance_name, field_name, field_description, field_valu
             unit_of_measurement, 
             device_name, 
             pgn_id,
-            instance_name
+            instance_name,
+            raw_value
         )
         
         hass.data[add_entities_key]([sensor])
         hass.data[created_sensors_key][sensor_name] = sensor
     else:
         # If sensor exists, update its state
-        _LOGGER.debug(f"Updating existing sensor {sensor_name} with new value: {field_value}")
+        _LOGGER.debug("Updating existing sensor %s with new value: %s", sensor_name, field_value)
         sensor = hass.data[created_sensors_key][sensor_name]
-        sensor.set_state(field_value)
+        sensor.set_state(field_value, raw_value)
 
 
 def process_packet(hass, instance_name, packet):
     
-    if len(packet) < 7:  # AA + E8 + Frame ID (4 bytes min) + 55
-        _LOGGER.error("Invalid packet length: %s", binascii.hexlify(packet))
+    # NMEA 2000 only uses extended (29 bit) frame IDs. The framer hands out whole frames, so
+    # the type byte is always there, and standard frames are shorter than extended ones
+    if not packet[1] & TYPE_EXTENDED_FLAG:
+        _LOGGER.debug("Ignoring standard CAN frame: %s", binascii.hexlify(packet))
         return
 
-    # Extract the type byte and data length from the type byte
-    type_byte = packet[1]
-    data_length = type_byte & 0x0F  # last 4 bits represent the data length
-    
-    # Extract and reverse the frame ID
-    frame_id = packet[2:6][::-1]
-    
-    # Convert frame_id bytes to an integer
-    frame_id_int = int.from_bytes(frame_id, byteorder='big')
-    
-    # Extracting Source ID from the frame ID
-    source_id = frame_id_int & 0xFF
-    source_id_hex = '{:02X}'.format(source_id)
-    
-    # Extracting PGN ID from the frame ID
-    pgn_id = (frame_id_int >> 8) & 0x3FFFF  # Shift right by 8 bits and mask to 18 bits
-    pgn_id_hex = '{:06X}'.format(pgn_id)  # Format PGN as a hex string with 6 digits
-    
-    # Extract and reverse the CAN data
-    can_data = packet[6:6 + data_length][::-1]
-    can_data_hex = binascii.hexlify(can_data).decode('ascii')
+    if len(packet) < 7:  # AA + type + Frame ID (4 bytes) + 55
+        _LOGGER.debug("Ignoring short extended CAN frame: %s", binascii.hexlify(packet))
+        return
     
-    # Prepare combined string in the format "PGN:Source_ID:CAN_Data"
-    combined_hex = f"{pgn_id_hex}:{source_id_hex}:{can_data_hex}"
+    frame = CanFrame.from_packet(packet)
     
-    # Log the extracted information including the combined string
-    _LOGGER.debug("PGN ID: %s, Frame ID: %s, CAN Data: %s, Source ID: %s, Combined: %s",
-                 pgn_id_hex,
-                 binascii.hexlify(frame_id).decode('ascii'),
-                 can_data_hex,
-                 source_id_hex,
-                 combined_hex)
+    # Only build the string form when it is going to be logged
+    if _LOGGER.isEnabledFor(logging.DEBUG):
+        _LOGGER.debug("Received %r", frame)
     
-    set_pgn_entity(hass, instance_name, combined_hex)
+    process_frame(hass, instance_name, frame)
     
     
 # SmartSensor class representing a basic sensor entity with state
@@ -549,7 +551,8 @@ class SmartSensor(Entity):
         unit_of_measurement=None, 
         device_name=None, 
         sentence_type=None,
-        instance_name=None
+        instance_name=None,
+        raw_value=None
     ):
         """Initialize the sensor."""
         _LOGGER.debug(f"Initializing sensor: {name} with state: {initial_state}")
@@ -558,6 +561,7 @@ class SmartSensor(Entity):
         self.entity_id = f"sensor.{self._unique_id}"
         self._name = friendly_name if friendly_name else self._unique_id
         self._state = initial_state
+        self._raw_value = raw_value
         self._group = group if group is not None else "Other"
         self._device_name = device_name
         self._sentence_type = sentence_type
@@ -590,6 +594,13 @@ class SmartSensor(Entity):
         """Return the unit of measurement."""
         return self._unit_of_measurement
 
+    @property
+    def extra_state_attributes(self):
+        """Return the raw value of fields published by the name of their value."""
+        if self._raw_value is None:
+            return None
+        return {"raw_value": self._raw_value}
+
     @property
     def device_info(self):
         """Return device information about this sensor."""
@@ -637,15 +648,16 @@ class SmartSensor(Entity):
         except Exception as e:  # Catch all other exception types
             _LOGGER.warning(f"Could not update state for sensor '{self._name}': {e}")
 
-    def set_state(self, new_state):
+    def set_state(self, new_state, raw_value=None):
         """Set the state of the sensor."""
         
         if new_state is not None and new_state != "":
             # Since the state is valid, update the sensor's state and the last updated timestamp
             self._state = new_state
+            self._raw_value = raw_value
             self._available = True
             self._last_updated = datetime.now()
-            _LOGGER.debug(f"Setting state for sensor: '{self._name}' to {new_state}")
+            _LOGGER.debug("Setting state for sensor: '%s' to %s", self._name, new_state)
         else:
             # For None or empty string, check the time since last valid update
             if self._last_updated and (datetime.now() - self._last_updated > timedelta(minutes=1)):
@@ -688,6 +700,16 @@ class SerialSensor(SensorEntity):
         xonxoff,
         rtscts,
         dsrdtr,
+        transport=DEFAULT_TRANSPORT,
+        execution_mode=DEFAULT_EXECUTION_MODE,
+        queue_size=DEFAULT_QUEUE_SIZE,
+        overload_policy=DEFAULT_OVERLOAD_POLICY,
+        fast_pgns=(),
+        high_priority_pgns=(),
+        low_priority_pgns=(),
+        recorder=None,
+        replay_path=None,
+        replay_speed=DEFAULT_REPLAY_SPEED,
     ):
         """Initialize the Serial sensor."""
         self._name = name
@@ -700,8 +722,34 @@ class SerialSensor(SensorEntity):
         self._xonxoff = xonxoff
         self._rtscts = rtscts
         self._dsrdtr = dsrdtr
+        self._transport = transport
+        self._execution_mode = execution_mode
         self._serial_loop_task = None
+        self._decode_task = None
+        self._reader_thread = None
+        self._decoder_thread = None
+        self._diagnostics_task = None
         self._attributes = None
+        self._framer = Smart2000Framer()
+        self._frame_queue = FrameQueue(
+            queue_size,
+            overload_policy,
+            fast_pgns,
+            high_priority_pgns,
+            low_priority_pgns,
+        )
+        self._frames_ready = None
+        self._recorder = recorder
+        self._replay = None
+        if replay_path:
+            self._replay = CaptureReplay(
+                replay_path,
+                self._framer,
+                self.handle_packet,
+                replay_speed,
+                pending=self._frame_queue.__len__,
+                capacity=queue_size,
+            )
         
         self._retry_delay = 5  # Reconnection tart with 5 seconds
         self._max_delay = 60  # Reconnection maximum delay of 1 minutes
@@ -710,56 +758,188 @@ class SerialSensor(SensorEntity):
 
     async def async_added_to_hass(self) -> None:
         """Handle when an entity is about to be added to Home Assistant."""
-        self._serial_loop_task = self.hass.loop.create_task(self.serial_read())
+        if self._execution_mode == EXECUTION_THREAD:
+            self._decoder_thread = DecoderThread(
+                self.hass.loop,
+                self._frame_queue,
+                self.decode_packet,
+                publish_field,
+            )
+            self._reader_thread = SerialReaderThread(
+                {
+                    "port": self._port,
+                    "baudrate": self._baudrate,
+                    "bytesize": self._bytesize,
+                    "parity": self._parity,
+                    "stopbits": self._stopbits,
+                    "xonxoff": self._xonxoff,
+                    "rtscts": self._rtscts,
+                    "dsrdtr": self._dsrdtr,
+                },
+                self._framer,
+                self.queue_packet,
+                self._decoder_thread.frames_ready,
+            )
+            self._decoder_thread.start()
+            if self._replay:
+                self._frames_ready = self._decoder_thread.frames_ready
+                self._serial_loop_task = self.hass.loop.create_task(self.replay_loop())
+            else:
+                self._reader_thread.start()
+        else:
+            self._frames_ready = asyncio.Event()
+            self._decode_task = self.hass.loop.create_task(self.decode_loop())
+            if self._replay:
+                self._serial_loop_task = self.hass.loop.create_task(self.replay_loop())
+            else:
+                self._serial_loop_task = self.hass.loop.create_task(self.serial_read())
+        self._diagnostics_task = self.hass.loop.create_task(self.update_diagnostics())
+
+    def diagnostics(self):
+        """Collect the counters of the reading and decoding pipeline."""
+        stats = self._framer.stats()
+        stats.update(self._frame_queue.stats())
+        cache = decode_can_id.cache_info()
+        stats["can_id_cache_size"] = cache.currsize
+        stats["can_id_cache_hits"] = cache.hits
+        stats["can_id_cache_misses"] = cache.misses
+        assembler = self.hass.data.get(f"{self._name}_fast_packet_key")
+        if assembler:
+            stats.update(assembler.stats())
+        transport = self.hass.data.get(f"{self._name}_transport_key")
+        if transport:
+            stats.update(transport.stats())
+        unknown_pgns = self.hass.data.get(f"{self._name}_unknown_pgns_key")
+        if unknown_pgns is not None:
+            stats["unknown_pgns"] = len(unknown_pgns)
+            stats["unknown_pgn_frames"] = sum(unknown_pgns.values())
+        unmatched_pgns = self.hass.data.get(f"{self._name}_unmatched_pgns_key")
+        if unmatched_pgns is not None:
+            stats["unmatched_pgn_frames"] = sum(unmatched_pgns.values())
+        short_frames = self.hass.data.get(f"{self._name}_short_frames_key")
+        if short_frames is not None:
+            stats["short_frames"] = sum(short_frames.values())
+        stats.update(PGN_INDEX.stats())
+        if self._recorder:
+            stats.update(self._recorder.stats())
+        if self._replay:
+            stats.update(self._replay.stats())
+        if self._decoder_thread:
+            stats.update(self._decoder_thread.stats())
+        return stats
+
+    async def update_diagnostics(self):
+        """Periodically expose the framing counters as sensor attributes."""
+        while True:
+            await asyncio.sleep(DIAGNOSTICS_INTERVAL)
+            self._attributes = self.diagnostics()
+            self.async_write_ha_state()
+
+
+    def queue_packet(self, packet):
+        """Record a framed packet if capturing and queue it for decoding."""
+        if self._recorder:
+            self._recorder.record(packet)
+        self._frame_queue.put(packet)
+
+
+    def handle_packet(self, packet):
+        """Queue a framed packet and wake up the decoder."""
+        self.queue_packet(packet)
+        self._frames_ready.set()
+
+
+    def decode_packet(self, packet):
+        """Process a single queued packet."""
+        process_packet(self.hass, self.name, packet)
+
+
+    async def decode_loop(self):
+        """Decode queued packets on the event loop, yielding to the reader between batches."""
+        frame_queue = self._frame_queue
+        while True:
+            await self._frames_ready.wait()
+            self._frames_ready.clear()
+
+            while True:
+                packets = frame_queue.get_batch(DECODE_BATCH_SIZE)
+                if not packets:
+                    break
+
+                # Decoders of PGNs seen for the first time are read from disk in the executor
+                missing_groups = PGN_INDEX.missing_groups(packets)
+                if missing_groups:
+                    await self.hass.async_add_executor_job(PGN_INDEX.load_groups, missing_groups)
+
+                for packet in packets:
+                    try:
+                        self.decode_packet(packet)
+                    except Exception as exc:
+                        _LOGGER.exception("Error while decoding packet: %s", exc)
+
+                # Let the reader drain the serial port before the next batch
+                await asyncio.sleep(0)
 
 
     async def read_loop(self, reader):
         """Continuously read data from the serial port."""
 
-        buffer = bytearray()
         try:
-            while True:
-                # Read chunks of data from the serial port
-                data = await reader.read(100)
-                if not data:
-                    # If no data and buffer is not empty, process remaining data
-                    if buffer:
-                        process_packet(self.hass, self.name, buffer)
-                        buffer = bytearray()
-                    break
-                buffer.extend(data)
-    
-                # Continue processing as long as there's data in the buffer
-                while True:
-                    # Find the packet start and end delimiters
-                    start = buffer.find(b'\xaa')
-                    end = buffer.find(b'\x55', start)
-                    
-                    if start == -1 or end == -1:
-                        # If start or end not found, wait for more data
-                        break
-    
-                    # Extract the complete packet, including the end delimiter
-                    packet = buffer[start:end+1]
-    
-                    # Process the packet
-                    if len(packet) > 2:  # Make sure it's not just the header and end code
-                        process_packet(self.hass, self.name, packet)
-    
-                    # Remove the processed packet from the buffer
-                    buffer = buffer[end+1:]
-    
+            await read_stream(reader, self._framer, self.handle_packet)
         except Exception as exc:
             _LOGGER.exception("Error while reading from serial port: %s", exc)
         finally:
             _LOGGER.debug("Finished reading data")
 
 
+    async def protocol_loop(self):
+        """Read data through a serial protocol until the connection is lost."""
+
+        serial_transport, protocol = await serial_asyncio.create_serial_connection(
+            self.hass.loop,
+            lambda: Smart2000Protocol(self._framer, self.handle_packet),
+            url=self._port,
+            baudrate=self._baudrate,
+            bytesize=self._bytesize,
+            parity=self._parity,
+            stopbits=self._stopbits,
+            xonxoff=self._xonxoff,
+            rtscts=self._rtscts,
+            dsrdtr=self._dsrdtr,
+        )
+
+        try:
+            exc = await protocol.closed
+            if exc is not None:
+                _LOGGER.error("Serial connection lost: %s", exc)
+        finally:
+            serial_transport.close()
+            _LOGGER.debug("Finished reading data")
+
+
+    async def replay_loop(self):
+        """Replay captured traffic in place of the serial port and report the rate."""
+        try:
+            frames = await self._replay.run()
+            stats = self._replay.stats()
+            _LOGGER.info("Replay finished: %d frames, %s frames/s end to end", frames, stats["replay_rate"])
+            self._attributes = self.diagnostics()
+            self.async_write_ha_state()
+        except asyncio.CancelledError:
+            _LOGGER.debug("Replay task was cancelled")
+        except Exception as exc:
+            _LOGGER.exception("Error while replaying %s: %s", self._replay.file, exc)
+
+
     async def serial_read(self):
         
         """Read the data from the port."""
         while True:
             try:
+                if self._transport == TRANSPORT_PROTOCOL:
+                    await self.protocol_loop()
+                    continue
+
                 reader, _ = await serial_asyncio.open_serial_connection(
                     url=self._port,
                     baudrate=self._baudrate,
@@ -802,6 +982,20 @@ class SerialSensor(SensorEntity):
         """Close resources."""
         if self._serial_loop_task:
             self._serial_loop_task.cancel()
+        if self._decode_task:
+            self._decode_task.cancel()
+        if self._reader_thread:
+            self._reader_thread.stop()
+        if self._decoder_thread:
+            self._decoder_thread.stop()
+        if self._diagnostics_task:
+            self._diagnostics_task.cancel()
+        if self._recorder:
+            self._recorder.close()
+
+    async def async_will_remove_from_hass(self) -> None:
+        """Stop reading and close the capture when the entity is removed."""
+        self.stop_serial_read(None)
 
     @property
     def name(self):
@@ -0,0 +1,76 @@
+"""
+Copyright (c) 2024 Smart Boat Innovations
+
+Version 1.0, 01 June 2024
+
+This file is part of the Smart Boat Innovations software.
+
+Smart Boat Innovations ("Licensor") grants you a limited, non-exclusive, non-transferable, revocable license to load and use this software through Home Assistant Community Store (HACS) for personal, non-commercial use only.
+
+You may not copy, distribute, or modify this file or the accompanying software. The software is provided "as is", without warranty of any kind, express or implied, including but not limited to the warranties of merchantability, fitness for a particular purpose and noninfringement. In no event shall the authors or copyright holders be liable for any claim, damages or other liability, whether in an action of contract, tort or otherwise, arising from, out of or in connection with the software or the use or other dealings in the software.
+
+See the full license text in the accompanying LICENSE file.
+"""
+
+# Standard Library Imports
+import asyncio
+import logging
+
+TRANSPORT_STREAM = "stream"
+TRANSPORT_PROTOCOL = "protocol"
+TRANSPORTS = [TRANSPORT_STREAM, TRANSPORT_PROTOCOL]
+
+STREAM_CHUNK_SIZE = 100
+
+_LOGGER = logging.getLogger(__name__)
+
+
+async def read_stream(reader, framer, packet_callback):
+    """
+    Reads the serial stream until EOF, passing every complete packet to packet_callback.
+
+    This is the stream reader transport: one coroutine resume per chunk read.
+    """
+    while True:
+        # Read chunks of data from the serial port
+        data = await reader.read(STREAM_CHUNK_SIZE)
+        if not data:
+            break
+
+        # Process every complete packet, the framer hands them out without copying
+        for packet in framer.feed(data):
+            packet_callback(packet)
+
+
+class Smart2000Protocol(asyncio.Protocol):
+    """
+    Protocol transport for the Smart2000 USB device.
+
+    The serial transport calls data_received with whatever the driver has buffered, which
+    is fed to the framer straight away without a coroutine switch per chunk.
+    """
+
+    def __init__(self, framer, packet_callback):
+        self._framer = framer
+        self._packet_callback = packet_callback
+        self.transport = None
+        self.closed = asyncio.get_running_loop().create_future()
+
+    def connection_made(self, transport):
+        """Store the transport once the serial port is open."""
+        self.transport = transport
+        _LOGGER.debug("Serial protocol connection established")
+
+    def data_received(self, data):
+        """Frame the received data and hand every complete packet on."""
+        try:
+            for packet in self._framer.feed(data):
+                self._packet_callback(packet)
+        except Exception as exc:
+            _LOGGER.exception("Error while processing serial data: %s", exc)
+
+    def connection_lost(self, exc):
+        """Resolve the closed future, with the error if the connection failed."""
+        _LOGGER.debug("Serial protocol connection lost: %s", exc)
+        if not self.closed.done():
+            self.closed.set_result(exc)
@@ -141,8 +141,8 @@ def decode_decimal(number_int):
         # Shift right by one byte (8 bits) to process the next byte
         number_int >>= 8
 
-    # Convert the string of digits to an integer
-    return int(decoded_digits)
+    # Convert the string of digits to an integer, no digits at all decode as 0
+    return int(decoded_digits) if decoded_digits else 0
 
 
 def decode_float(number_int):
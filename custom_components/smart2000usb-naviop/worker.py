@@ -0,0 +1,205 @@
+"""
+Copyright (c) 2024 Smart Boat Innovations
+
+Version 1.0, 01 June 2024
+
+This file is part of the Smart Boat Innovations software.
+
+Smart Boat Innovations ("Licensor") grants you a limited, non-exclusive, non-transferable, revocable license to load and use this software through Home Assistant Community Store (HACS) for personal, non-commercial use only.
+
+You may not copy, distribute, or modify this file or the accompanying software. The software is provided "as is", without warranty of any kind, express or implied, including but not limited to the warranties of merchantability, fitness for a particular purpose and noninfringement. In no event shall the authors or copyright holders be liable for any claim, damages or other liability, whether in an action of contract, tort or otherwise, arising from, out of or in connection with the software or the use or other dealings in the software.
+
+See the full license text in the accompanying LICENSE file.
+"""
+
+# Standard Library Imports
+import logging
+import queue
+import threading
+
+# Third-Party Library Imports
+import serial
+from serial import SerialException
+
+EXECUTION_EVENT_LOOP = "event_loop"
+EXECUTION_THREAD = "thread"
+EXECUTION_MODES = [EXECUTION_EVENT_LOOP, EXECUTION_THREAD]
+
+DEFAULT_MAX_PENDING_BATCHES = 64
+DECODE_BATCH_SIZE = 256  # Frames decoded before their field updates are handed to the loop
+READ_TIMEOUT = 0.1  # Seconds a blocking wait lasts before checking for a stop request
+
+_LOGGER = logging.getLogger(__name__)
+
+# Holds the field update batch of the decoder thread, unset on every other thread
+_thread_state = threading.local()
+
+
+def current_batch():
+    """Returns the list collecting field updates on a decoder thread, None elsewhere."""
+    return getattr(_thread_state, "batch", None)
+
+
+class SerialReaderThread(threading.Thread):
+    """
+    Reads the serial port with pyserial and hands every framed packet to packet_callback,
+    which queues it for the decoder thread.
+
+    Reading never waits for decoding, so the kernel serial buffer is drained even when the
+    decoder falls behind. Overload is then handled by the frame queue policy.
+    """
+
+    def __init__(self, serial_kwargs, framer, packet_callback, frames_ready, retry_delay=5, max_delay=60):
+        super().__init__(name="smart2000usb_reader", daemon=True)
+        self._serial_kwargs = serial_kwargs
+        self._framer = framer
+        self._packet_callback = packet_callback
+        self._frames_ready = frames_ready
+        self._stop_event = threading.Event()
+        self._retry_delay = retry_delay
+        self._max_delay = max_delay
+
+    def stop(self):
+        """Ask the thread to finish, it exits within one read timeout."""
+        self._stop_event.set()
+
+    def run(self):
+        """Keep the serial port open and queue everything it delivers until stopped."""
+        retry_delay = self._retry_delay
+        while not self._stop_event.is_set():
+            try:
+                with serial.Serial(timeout=READ_TIMEOUT, **self._serial_kwargs) as port:
+                    _LOGGER.debug("Serial connection established in reader thread")
+                    retry_delay = self._retry_delay
+                    self._read_port(port)
+            except SerialException as exc:
+                _LOGGER.error("Serial connection failed: %s. Retrying in %d seconds...", exc, retry_delay)
+                self._stop_event.wait(retry_delay)
+                retry_delay = min(retry_delay * 2, self._max_delay)
+            except Exception as exc:
+                _LOGGER.exception("Unexpected error in reader thread: %s. Retrying in %d seconds...", exc, retry_delay)
+                self._stop_event.wait(retry_delay)
+                retry_delay = min(retry_delay * 2, self._max_delay)
+
+        _LOGGER.debug("Reader thread finished")
+
+    def _read_port(self, port):
+        """Read and queue chunks until the thread is stopped."""
+        packet_callback = self._packet_callback
+        while not self._stop_event.is_set():
+            data = port.read(port.in_waiting or 1)
+            if data:
+                for packet in self._framer.feed(data):
+                    packet_callback(packet)
+                self._frames_ready.set()
+
+
+class DecoderThread(threading.Thread):
+    """
+    Decodes queued frames away from the Home Assistant event loop.
+
+    Field updates published while a batch of frames is decoded are collected. Each batch
+    goes through a bounded queue and is applied on the event loop by a single
+    call_soon_threadsafe. When the loop falls behind and the queue is full, new batches
+    are dropped and counted instead of piling up.
+    """
+
+    def __init__(
+        self,
+        loop,
+        frame_queue,
+        packet_callback,
+        apply_update,
+        max_pending_batches=DEFAULT_MAX_PENDING_BATCHES,
+    ):
+        super().__init__(name="smart2000usb_decoder", daemon=True)
+        self._loop = loop
+        self._frame_queue = frame_queue
+        self._packet_callback = packet_callback
+        self._apply_update = apply_update
+        self._pending = queue.Queue(maxsize=max_pending_batches)
+        self._stop_event = threading.Event()
+        self.frames_ready = threading.Event()
+
+        self.batches = 0
+        self.updates = 0
+        self.dropped_batches = 0
+        self.dropped_updates = 0
+        self.max_queue_depth = 0
+
+    def stop(self):
+        """Ask the thread to finish, it exits within one wait timeout."""
+        self._stop_event.set()
+        self.frames_ready.set()
+
+    def run(self):
+        """Decode queued frames until stopped."""
+        frame_queue = self._frame_queue
+        while not self._stop_event.is_set():
+            if not self.frames_ready.wait(READ_TIMEOUT):
+                continue
+            self.frames_ready.clear()
+
+            while not self._stop_event.is_set():
+                packets = frame_queue.get_batch(DECODE_BATCH_SIZE)
+                if not packets:
+                    break
+                self.decode(packets)
+
+        _LOGGER.debug("Decoder thread finished")
+
+    def decode(self, packets):
+        """Decode a batch of packets, then hand their field updates to the loop."""
+        batch = []
+        _thread_state.batch = batch
+        try:
+            for packet in packets:
+                try:
+                    self._packet_callback(packet)
+                except Exception as exc:
+                    _LOGGER.exception("Error while decoding packet: %s", exc)
+        finally:
+            _thread_state.batch = None
+
+        if batch:
+            self._submit(batch)
+
+    def _submit(self, batch):
+        """Queue a batch for the event loop, dropping it if the queue is full."""
+        try:
+            self._pending.put_nowait(batch)
+        except queue.Full:
+            self.dropped_batches += 1
+            self.dropped_updates += len(batch)
+            return
+
+        depth = self._pending.qsize()
+        if depth > self.max_queue_depth:
+            self.max_queue_depth = depth
+
+        self._loop.call_soon_threadsafe(self._apply_batch)
+
+    def _apply_batch(self):
+        """Apply one queued batch of field updates, runs on the event loop."""
+        try:
+            batch = self._pending.get_nowait()
+        except queue.Empty:
+            return
+
+        apply_update = self._apply_update
+        for update in batch:
+            apply_update(*update)
+
+        self.batches += 1
+        self.updates += len(batch)
+
+    def stats(self):
+        """Returns the decoder thread counters."""
+        return {
+            "pending_batches": self._pending.qsize(),
+            "max_pending_batches": self.max_queue_depth,
+            "batches": self.batches,
+            "updates": self.updates,
+            "dropped_batches": self.dropped_batches,
+            "dropped_updates": self.dropped_updates,
+        }
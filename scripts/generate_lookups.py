@@ -0,0 +1,268 @@
+"""Regenerates pgn_lookups.json and the lookup options of pgn_fields/ from canboat.json.
+
+pgn_fields/ follows canboat.json of CANboat v5.0.3 (docs/canboat.json in the CANboat
+repository). Every LOOKUP field gets the enumeration CANboat gives it as its lookup option,
+and pgn_lookups.json gets the values of every enumeration a field uses. Definitions of a
+PGN are paired with CANboat's by their match values and description, fields by their
+name (ignoring case and punctuation, CANboat ids are camel case) and length. Fields that
+were renamed or resized are left without a lookup rather than guessed.
+
+Where canboat.json cannot be fetched, the pgns.py of the nmea2000 package on PyPI can be
+given instead. It is generated from canboat.json (of a later CANboat version) and keeps
+every field's offset, length, type, match value and enumeration, which is all that is read
+here. The source is recorded in the header of pgn_lookups.json.
+
+The field rows are rewritten in place, one per line as before, so the diff only shows the
+options that changed. Run with ``python scripts/generate_lookups.py path/to/canboat.json``.
+"""
+import argparse
+import ast
+import json
+import os
+import re
+import sys
+
+REPOSITORY_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COMPONENT_DIR = os.path.join(REPOSITORY_DIR, "custom_components", "smart2000usb-naviop")
+
+LOOKUPS_COMMENT = "Smart 2000 names of the values of LOOKUP fields"
+LOOKUPS_FORMAT = "enumeration name -> [[value, name], ...], fields name their enumeration with the lookup option"
+
+# Columns of a field row in pgn_fields/, see decoder.py
+NAME, OFFSET, BITS, TYPE, OPTIONS = 0, 2, 3, 6, 8
+
+PGN_LINE = re.compile(r'\s*"pgn": (\d+),')
+DESCRIPTION_LINE = re.compile(r'\s*"description": (".*"),$')
+FIELDS_LINE = re.compile(r'\s*"fields": \[')
+ROW_LINE = re.compile(r"(\s*)(\[.*\])(,?)$")
+
+# The parts of the nmea2000 package's pgns.py that carry the canboat.json data
+PGNS_PY_DECODER = re.compile(r"\ndef decode_pgn_\w+\(_data_raw_")
+PGNS_PY_MESSAGE = re.compile(r"NMEA2000Message\(PGN=(\d+), id='([^']*)', description='((?:[^'\\]|\\.)*)'")
+PGNS_PY_FIELD = re.compile(
+    r"# (\d+):(\w*) \| Offset: (\d*), Length: (\d*), Signed: \w+ Resolution: [^,]*, Field Type: (\w+), Match: ([^,]*),"
+)
+PGNS_PY_LOOKUP = re.compile(r"master_dict\['([A-Z0-9_]+)'\]")
+
+
+def load_pgns_py(path):
+    """Returns the canboat.json PGNs and enumerations kept in the nmea2000 package's pgns.py."""
+    with open(path) as file:
+        source = file.read()
+
+    lookups = next(
+        ast.literal_eval(node.value)
+        for node in ast.parse(source).body
+        if isinstance(node, ast.Assign) and getattr(node.targets[0], "id", None) == "master_dict"
+    )
+    enumerations = [
+        {"Name": name, "EnumValues": [{"Name": value_name, "Value": value} for value, value_name in sorted(values.items())]}
+        for name, values in sorted(lookups.items())
+    ]
+
+    definitions = []
+    for body in PGNS_PY_DECODER.split(source)[1:]:
+        body = body.split("\ndef ", 1)[0]
+        message = PGNS_PY_MESSAGE.search(body)
+        if message is None:
+            continue
+        parts = PGNS_PY_FIELD.split(body)
+        fields = []
+        for index in range(1, len(parts), 7):
+            order, field_id, offset, length, field_type, match = parts[index:index + 6]
+            field = {"Order": int(order), "Id": field_id, "FieldType": field_type}
+            if offset:
+                field["BitOffset"] = int(offset)
+            if length:
+                field["BitLength"] = int(length)
+            if match.strip():
+                field["Match"] = int(match)
+            lookup = PGNS_PY_LOOKUP.search(parts[index + 6])
+            if lookup is not None and field_type == "LOOKUP":
+                field["LookupEnumeration"] = lookup.group(1)
+            fields.append(field)
+        definitions.append({"PGN": int(message.group(1)), "Id": message.group(2), "Description": message.group(3), "Fields": fields})
+
+    return {"PGNs": definitions, "LookupEnumerations": enumerations}
+
+
+def canboat_definitions(canboat):
+    """Returns pgn -> the CANboat definitions of the PGN, in file order."""
+    definitions = {}
+    for definition in canboat["PGNs"]:
+        definitions.setdefault(definition["PGN"], []).append(definition)
+    return definitions
+
+
+def match_values(rows):
+    """Returns bit offset -> match value of the field rows of a definition."""
+    return {
+        row[OFFSET]: row[OPTIONS]["match"]
+        for row in rows
+        if len(row) > OPTIONS and "match" in row[OPTIONS]
+    }
+
+
+def field_key(name):
+    """Returns a field name or CANboat id without case and punctuation."""
+    return re.sub(r"[^a-z0-9]", "", name.lower())
+
+
+def pair_definition(pgn, description, rows, candidates, paired):
+    """
+    Returns the CANboat definition not paired before with the same match values and
+    description, else the same match values, else the same description.
+    """
+    matches = match_values(rows)
+
+    def same_matches(candidate):
+        return {field.get("BitOffset"): field["Match"] for field in candidate["Fields"] if "Match" in field} == matches
+
+    def same_description(candidate):
+        return candidate["Description"] == description
+
+    for same in (
+        lambda candidate: same_matches(candidate) and same_description(candidate),
+        same_matches,
+        same_description,
+    ):
+        for index, candidate in enumerate(candidates):
+            if (pgn, index) not in paired and same(candidate):
+                paired.add((pgn, index))
+                return candidate
+    return None
+
+
+def field_enumerations(rows, definition):
+    """Returns row index -> CANboat enumeration of the LOOKUP rows of a definition."""
+    fields = {field_key(field["Id"]): field for field in definition["Fields"]}
+
+    enumerations = {}
+    for index, row in enumerate(rows):
+        field = fields.get(field_key(row[NAME]))
+        if row[TYPE] == "LOOKUP" and field is not None and field.get("BitLength") == row[BITS] and "LookupEnumeration" in field:
+            enumerations[index] = field["LookupEnumeration"]
+    return enumerations
+
+
+def update_fields_file(path, definitions, paired, used, counts):
+    """Rewrites the lookup options of one file of pgn_fields/ in place."""
+    with open(path) as file:
+        lines = file.read().split("\n")
+
+    # The rows of a definition are collected first, the lookups need all of them
+    pgn = None
+    description = None
+    rows = []
+    row_lines = []
+
+    def flush():
+        definition = pair_definition(pgn, description, rows, definitions.get(pgn, []), paired)
+        if definition is None:
+            counts["unpaired"] += 1
+            enumerations = {}
+        else:
+            enumerations = field_enumerations(rows, definition)
+
+        for index, (row, line_index) in enumerate(zip(rows, row_lines)):
+            if row[TYPE] != "LOOKUP":
+                continue
+            counts["fields"] += 1
+            options = dict(row[OPTIONS]) if len(row) > OPTIONS else {}
+            options.pop("lookup", None)
+            if index in enumerations:
+                options["lookup"] = enumerations[index]
+                used.add(enumerations[index])
+                counts["named"] += 1
+            row = row[:OPTIONS] + ([options] if options else [])
+            indent, _, comma = ROW_LINE.match(lines[line_index]).groups()
+            lines[line_index] = indent + json.dumps(row) + comma
+
+    in_fields = False
+    for line_index, line in enumerate(lines):
+        match = PGN_LINE.match(line)
+        if match:
+            pgn = int(match.group(1))
+            continue
+        match = DESCRIPTION_LINE.match(line)
+        if match:
+            description = json.loads(match.group(1))
+            continue
+        if FIELDS_LINE.match(line):
+            in_fields = True
+            rows = []
+            row_lines = []
+            continue
+        if not in_fields:
+            continue
+        match = ROW_LINE.match(line)
+        if match:
+            rows.append(json.loads(match.group(2)))
+            row_lines.append(line_index)
+        else:
+            in_fields = False
+            flush()
+
+    text = "\n".join(lines)
+    json.loads(text)
+    with open(path, "w") as file:
+        file.write(text)
+
+
+def write_lookups(path, header, source, enumerations, used):
+    """Writes the values of the used enumerations to pgn_lookups.json, one per line."""
+    header = dict(header, Comment=LOOKUPS_COMMENT, Source=source, Lookups=LOOKUPS_FORMAT)
+    lookups = []
+    for name in sorted(used):
+        values = sorted((value["Value"], value["Name"]) for value in enumerations[name]["EnumValues"])
+        lookups.append(f"    {json.dumps(name)}: {json.dumps(values)}")
+
+    lines = ["{", '  "Header": ' + json.dumps(header, indent=2).replace("\n", "\n  ") + ",", '  "Lookups": {']
+    lines.append(",\n".join(lookups))
+    lines += ["  }", "}", ""]
+    text = "\n".join(lines)
+    json.loads(text)
+    with open(path, "w") as file:
+        file.write(text)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("canboat", help="canboat.json of the CANboat version pgn_fields/ follows, or nmea2000/pgns.py")
+    parser.add_argument("--source", help="how the input was obtained, recorded in pgn_lookups.json (default: its name)")
+    parser.add_argument("--component", default=COMPONENT_DIR, help="directory of the integration")
+    args = parser.parse_args()
+
+    if args.canboat.endswith(".py"):
+        canboat = load_pgns_py(args.canboat)
+    else:
+        with open(args.canboat) as file:
+            canboat = json.load(file)
+    source = args.source or " ".join(
+        filter(None, (os.path.basename(args.canboat), canboat.get("Version") and f"version {canboat['Version']}"))
+    )
+    enumerations = {enumeration["Name"]: enumeration for enumeration in canboat["LookupEnumerations"]}
+    definitions = canboat_definitions(canboat)
+
+    fields_dir = os.path.join(args.component, "pgn_fields")
+    paired = set()
+    used = set()
+    counts = {"fields": 0, "named": 0, "unpaired": 0}
+    for file_name in sorted(os.listdir(fields_dir)):
+        if file_name.endswith(".json"):
+            update_fields_file(os.path.join(fields_dir, file_name), definitions, paired, used, counts)
+
+    unknown = used - enumerations.keys()
+    if unknown:
+        sys.exit(f"Enumerations missing from {args.canboat}: {', '.join(sorted(unknown))}")
+
+    with open(os.path.join(args.component, "pgn_type.json")) as file:
+        header = json.load(file)["Header"]
+    write_lookups(os.path.join(args.component, "pgn_lookups.json"), header, source, enumerations, used)
+
+    print(f"{counts['named']} of {counts['fields']} LOOKUP fields named from {len(used)} enumerations, "
+          f"{counts['unpaired']} definitions without a CANboat counterpart")
+
+
+if __name__ == "__main__":
+    main()